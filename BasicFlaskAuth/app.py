@@ -1,8 +1,9 @@
 from flask import Flask, request, abort
-import json
+import os
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from jwks import JWKSCache, KeysUnavailable
 
 
 app = Flask(__name__)
@@ -11,6 +12,15 @@ AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
 ALGORITHMS = ['RS256']
 API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
 
+# the key set is fetched once and reused across requests; point JWKS_URL
+# at a file:// URL or a local server to test without Auth0
+JWKS_URL = os.environ.get('JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+jwks_cache = JWKSCache(
+    JWKS_URL,
+    ttl=int(os.environ.get('JWKS_CACHE_TTL', 600)),
+    stale_ttl=int(os.environ.get('JWKS_STALE_TTL', 3600))
+)
+
 
 class AuthError(Exception):
     def __init__(self, error, status_code):
@@ -52,25 +62,20 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    try:
+        rsa_key = jwks_cache.get_key(unverified_header['kid'])
+    except KeysUnavailable:
+        raise AuthError({
+            'code': 'keys_unavailable',
+            'description': 'Unable to load the signing keys.'
+        }, 503)
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -111,6 +116,9 @@ def requires_auth(f):
         token = get_token_auth_header()
         try:
             payload = verify_decode_jwt(token)
+        except AuthError as e:
+            # the identity provider, not the token, is at fault
+            abort(503 if e.status_code == 503 else 401)
         except:
             abort(401)
         return f(payload, *args, **kwargs)
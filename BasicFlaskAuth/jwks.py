@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+
+def fetch_jwks(url, timeout=5):
+    """Downloads and decodes a JSON Web Key Set
+
+    Any URL understood by urlopen works, so a local key set can be
+    served with file:///path/to/jwks.json when testing.
+    """
+    with urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def build_key_map(jwks):
+    """Builds the kid -> RSA key dictionary used by jwt.decode
+    """
+    keys = {}
+    for key in jwks.get('keys', []):
+        if 'kid' not in key:
+            continue
+        keys[key['kid']] = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key.get('use'),
+            'n': key['n'],
+            'e': key['e']
+        }
+    return keys
+
+
+class KeysUnavailable(Exception):
+    """Raised when no key set younger than ttl + stale_ttl could be loaded
+    """
+
+
+class JWKSCache:
+    """Process-wide cache of the identity provider's signing keys
+
+    Keys are served from memory for `ttl` seconds. Once that expires the
+    cached keys are still served for up to `stale_ttl` more seconds while
+    a single background thread refreshes them. An unknown kid triggers a
+    blocking refresh, shared by every thread that asks at the same time.
+    Refreshes of either kind start at most once per `min_refresh_interval`
+    seconds, so that a flood of bogus tokens or a provider that is down or
+    throttling is not hammered. Past `stale_ttl` the old keys are no longer
+    trusted and get_key raises KeysUnavailable until a refresh succeeds.
+    """
+
+    def __init__(self, url, ttl=600, stale_ttl=3600, min_refresh_interval=30,
+                 fetch=fetch_jwks, clock=time.monotonic):
+        self.url = url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._fetch = fetch
+        self._clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._refresh_lock = threading.Lock()
+
+    def get_key(self, kid):
+        """Returns the RSA key for `kid`, or None if the provider has no such key
+
+        Raises KeysUnavailable when the cached keys are too old to be trusted
+        and could not be refreshed.
+        """
+        now = self._clock()
+        age = None if self._fetched_at is None else now - self._fetched_at
+
+        if age is None or age >= self.ttl + self.stale_ttl or kid not in self._keys:
+            self._refresh(now)
+        elif age >= self.ttl:
+            self._refresh_in_background(now)
+
+        fetched_at = self._fetched_at
+        if fetched_at is None or self._clock() - fetched_at >= self.ttl + self.stale_ttl:
+            raise KeysUnavailable('no signing keys younger than %d seconds from %s'
+                                  % (self.ttl + self.stale_ttl, self.url))
+        return self._keys.get(kid)
+
+    def clear(self):
+        with self._refresh_lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._attempted_at = None
+
+    def _refresh(self, requested_at):
+        with self._refresh_lock:
+            # another thread refreshed while we were waiting for the lock
+            if self._fetched_at is not None and self._fetched_at >= requested_at:
+                return
+            if self._attempted_recently(requested_at):
+                return
+            self._load()
+
+    def _attempted_recently(self, now):
+        return self._attempted_at is not None and now - self._attempted_at < self.min_refresh_interval
+
+    def _refresh_in_background(self, requested_at):
+        if self._attempted_recently(requested_at):
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._load()
+            except Exception:
+                pass
+            finally:
+                self._refresh_lock.release()
+
+        try:
+            threading.Thread(target=run, daemon=True).start()
+        except Exception:
+            self._refresh_lock.release()
+            raise
+
+    def _load(self):
+        # callers must hold _refresh_lock
+        self._attempted_at = self._clock()
+        try:
+            keys = build_key_map(self._fetch(self.url))
+        except Exception as e:
+            # keep serving the last good key set if the provider is down
+            # or throttling us; get_key decides whether it is still usable
+            if not self._keys:
+                raise KeysUnavailable('could not load signing keys from %s' % self.url) from e
+            return
+        self._keys = keys
+        self._fetched_at = self._clock()
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import unittest
+
+from jwks import JWKSCache, KeysUnavailable
+
+
+def key_set(*kids):
+    return {'keys': [{'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': 'n-' + kid, 'e': 'AQAB'} for kid in kids]}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubProvider:
+    """Serves key sets from memory and counts the requests made to it"""
+
+    def __init__(self, jwks):
+        self.jwks = jwks
+        self.down = False
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        if self.down:
+            raise OSError('provider unavailable')
+        return self.jwks
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    """This class represents the signing key cache test case"""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.provider = StubProvider(key_set('a'))
+        self.cache = JWKSCache('https://example.test/jwks.json', ttl=600, stale_ttl=3600,
+                               min_refresh_interval=30, fetch=self.provider, clock=self.clock)
+
+    def wait_for_background_refresh(self):
+        # the refresh thread holds the lock until it is done
+        with self.cache._refresh_lock:
+            pass
+
+    def test_fresh_keys_from_local_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jwks.json')
+            with open(path, 'w') as f:
+                json.dump(key_set('a'), f)
+            cache = JWKSCache('file://' + path)
+
+            self.assertEqual(cache.get_key('a')['n'], 'n-a')
+            self.assertIsNone(cache.get_key('missing'))
+
+    def test_fresh_keys_are_not_refetched(self):
+        self.cache.get_key('a')
+        self.clock.now += 599
+        self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+
+        self.assertEqual(self.provider.calls, 1)
+
+    def test_stale_keys_served_while_refreshed_in_background(self):
+        self.cache.get_key('a')
+        self.provider.jwks = key_set('a', 'b')
+        self.clock.now += 700
+
+        self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+        self.wait_for_background_refresh()
+        self.assertEqual(self.provider.calls, 2)
+        self.assertEqual(self.cache.get_key('b')['kid'], 'b')
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_failed_background_refresh_backs_off(self):
+        self.cache.get_key('a')
+        self.provider.down = True
+        self.clock.now += 700
+
+        for _ in range(5):
+            self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+            self.wait_for_background_refresh()
+        self.assertEqual(self.provider.calls, 2)
+
+        self.clock.now += 30
+        self.cache.get_key('a')
+        self.wait_for_background_refresh()
+        self.assertEqual(self.provider.calls, 3)
+
+    def test_unknown_kid_refreshes_at_most_once_per_interval(self):
+        self.cache.get_key('a')
+        self.clock.now += 30
+        for _ in range(5):
+            self.assertIsNone(self.cache.get_key('bogus'))
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_expired_keys_are_rejected(self):
+        self.cache.get_key('a')
+        self.provider.down = True
+        self.clock.now += 600 + 3600
+
+        with self.assertRaises(KeysUnavailable):
+            self.cache.get_key('a')
+        # the failed attempt is not repeated on every request
+        with self.assertRaises(KeysUnavailable):
+            self.cache.get_key('a')
+        self.assertEqual(self.provider.calls, 2)
+
+        self.provider.down = False
+        self.clock.now += 30
+        self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+
+    def test_no_keys_when_provider_is_down(self):
+        self.provider.down = True
+
+        with self.assertRaises(KeysUnavailable):
+            self.cache.get_key('a')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,15 @@
-from flask import Flask, request, jsonify, abort
+import os
+
+from flask import Flask, request, abort
+
+import fast_json
+from fast_json import jsonify
+from greeting_store import GreetingStore
 
 app = Flask(__name__)
+fast_json.init_app(app)
 
-greetings = {
+default_greetings = {
             'en': 'hello', 
             'es': 'Hola', 
             'ar': 'مرحبا',
@@ -12,22 +19,26 @@ greetings = {
             'ja': 'こんにちは'
             }
 
+# set GREETINGS_FILE to keep added greetings across restarts
+greetings = GreetingStore(default_greetings, path=os.environ.get('GREETINGS_FILE'))
+
 @app.route('/greeting', methods=['GET'])
 def greeting_all():
-    return jsonify({'greetings': greetings})
+    return app.response_class(greetings.encoded(), mimetype='application/json')
 
 @app.route('/greeting/<lang>', methods=['GET'])
 def greeting_one(lang):
-    print(lang)
-    if(lang not in greetings):
+    greeting = greetings.get(lang)
+    if(greeting is None):
         abort(404)
-    return jsonify({'greeting': greetings[lang
-    ]})
+    return jsonify({'greeting': greeting})
 
 @app.route('/greeting', methods=['POST'])
 def greeting_add():
-    info = request.get_json()
-    if('lang' not in info or 'greeting' not in info):
+    info = request.get_json(silent=True)
+    if(not isinstance(info, dict) or 'lang' not in info or 'greeting' not in info):
+        abort(422)
+    if(not all(isinstance(info[key], str) and info[key] for key in ('lang', 'greeting'))):
         abort(422)
-    greetings[info['lang']] = info['greeting']
-    return jsonify({'greetings':greetings})
+    body = greetings.set(info['lang'], info['greeting'])
+    return app.response_class(body, mimetype='application/json')
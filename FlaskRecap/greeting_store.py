@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+
+import fast_json
+
+'''
+GreetingStore
+    a thread-safe map of language code to greeting
+
+    readers never lock: every write builds a new read-only snapshot and
+    swaps it in at once. each snapshot keeps its {"greetings": ...} JSON
+    encoding per backend, built on first use under the app's JSON_BACKEND,
+    so a GET returns ready-made bytes no matter how many POSTs are running,
+    and a response never sees a half-applied write
+
+    with a path, every write is appended to that file as a JSON line and
+    the file is replayed on start-up, so added greetings survive restarts
+'''
+class GreetingStore:
+    def __init__(self, greetings, path=None, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._write_lock = threading.Lock()
+        greetings = dict(greetings)
+        if path is not None:
+            greetings.update(self._replay(path))
+        self._state = self._build(greetings)
+
+    @staticmethod
+    def _build(greetings):
+        return MappingProxyType(greetings), {}
+
+    @staticmethod
+    def _encode(state):
+        snapshot, encodings = state
+        backend = fast_json.current_backend()
+        body = encodings.get(backend)
+        if body is None:
+            # racing readers may both encode; they store the same bytes
+            body = fast_json.BACKENDS[backend]({'greetings': dict(snapshot)}, sort_keys=True) + b'\n'
+            encodings[backend] = body
+        return body
+
+    @staticmethod
+    def _replay(path):
+        greetings = {}
+        if not os.path.exists(path):
+            return greetings
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # blank, or torn by a crash mid-write; the other lines are intact
+                continue
+            if not isinstance(entry, dict):
+                continue
+            lang, greeting = entry.get('lang'), entry.get('greeting')
+            if not (isinstance(lang, str) and lang and isinstance(greeting, str) and greeting):
+                # not written by _append; skip it like a torn line
+                continue
+            greetings[lang] = greeting
+        if text and not text.endswith('\n'):
+            # keep the next append from running into the torn line
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+        return greetings
+
+    '''
+    snapshot()
+        the current greetings as a read-only mapping that later writes never change
+    '''
+    def snapshot(self):
+        return self._state[0]
+
+    '''
+    encoded()
+        the current {"greetings": ...} response body as utf-8 JSON bytes
+    '''
+    def encoded(self):
+        return self._encode(self._state)
+
+    def get(self, lang):
+        return self._state[0].get(lang)
+
+    '''
+    set(lang, greeting)
+        adds or replaces a greeting and returns the new encoded snapshot
+        the snapshot is encoded before the write is logged, so the log never
+        holds an entry that replay could not apply
+    '''
+    def set(self, lang, greeting):
+        with self._write_lock:
+            greetings = dict(self._state[0])
+            greetings[lang] = greeting
+            state = self._build(greetings)
+            body = self._encode(state)
+            if self.path is not None:
+                self._append(lang, greeting)
+            self._state = state
+        return body
+
+    def _append(self, lang, greeting):
+        line = json.dumps({'lang': lang, 'greeting': greeting}, ensure_ascii=False) + '\n'
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from flask import Flask
+
+import fast_json
+from greeting_store import GreetingStore
+
+
+class GreetingStoreTestCase(unittest.TestCase):
+    """This class represents the greeting store test case"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'greetings.jsonl')
+
+    def tearDown(self):
+        fast_json.BACKENDS.pop('test', None)
+        self.directory.cleanup()
+
+    def write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_set_is_replayed(self):
+        store = GreetingStore({'en': 'hello'}, path=self.path)
+        store.set('fi', 'Hei')
+        store.set('en', 'hi')
+
+        replayed = GreetingStore({'en': 'hello'}, path=self.path)
+        self.assertEqual(dict(replayed.snapshot()), {'en': 'hi', 'fi': 'Hei'})
+
+    def test_replay_skips_torn_and_foreign_lines(self):
+        self.write('{"lang": "fi", "greeting": "Hei"}\n'
+                   '\n'
+                   '["ru", "Привет"]\n'
+                   '"ja"\n'
+                   '{"lang": "he"}\n'
+                   '{"lang": ["es"], "greeting": "Hola"}\n'
+                   '{"lang": "ar", "greeting": 7}\n'
+                   '{"lang": "es", "greeting": "Hola"}\n'
+                   '{"lang": "ru", "gree')
+
+        store = GreetingStore({'en': 'hello'}, path=self.path)
+        store.set('ja', 'こんにちは')
+
+        self.assertEqual(dict(store.snapshot()), {'en': 'hello', 'fi': 'Hei', 'es': 'Hola', 'ja': 'こんにちは'})
+        with open(self.path, encoding='utf-8') as f:
+            # the torn last line was ended before the new entry was appended
+            self.assertEqual(json.loads(f.read().splitlines()[-1]), {'lang': 'ja', 'greeting': 'こんにちは'})
+
+    def test_concurrent_set(self):
+        store = GreetingStore({}, path=self.path)
+        langs = ['lang{}'.format(i) for i in range(200)]
+
+        def worker(offset):
+            for lang in langs[offset::4]:
+                store.set(lang, 'hello ' + lang)
+
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = {lang: 'hello ' + lang for lang in langs}
+        self.assertEqual(dict(store.snapshot()), expected)
+        self.assertEqual(json.loads(store.encoded()), {'greetings': expected})
+        self.assertEqual(dict(GreetingStore({}, path=self.path).snapshot()), expected)
+
+    def test_snapshot_swap(self):
+        store = GreetingStore({'en': 'hello'})
+        before, before_body = store.snapshot(), store.encoded()
+
+        body = store.set('fi', 'Hei')
+
+        self.assertEqual(dict(before), {'en': 'hello'})
+        self.assertEqual(json.loads(before_body), {'greetings': {'en': 'hello'}})
+        self.assertEqual(json.loads(body), {'greetings': {'en': 'hello', 'fi': 'Hei'}})
+        self.assertIs(store.encoded(), body)
+        with self.assertRaises(TypeError):
+            store.snapshot()['ru'] = 'Привет'
+
+    def test_snapshot_built_at_import_uses_configured_backend(self):
+        # built outside any app context, as FlaskRecap.py does at import
+        store = GreetingStore({'en': 'hello'})
+        fast_json.BACKENDS['test'] = lambda obj, sort_keys=False, indent=None: b'test'
+        app = Flask(__name__)
+        app.config['JSON_BACKEND'] = 'test'
+
+        with app.app_context():
+            self.assertEqual(store.encoded(), b'test\n')
+            self.assertEqual(store.set('fi', 'Hei'), b'test\n')
+        self.assertEqual(json.loads(store.encoded()), {'greetings': {'en': 'hello', 'fi': 'Hei'}})
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -3,15 +3,22 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import itertools
+import click
+from datetime import datetime, timedelta
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
 from flask_wtf import Form
+from sqlalchemy.exc import SQLAlchemyError
 from forms import *
+from search import NameSearch
+from counters import ShowCounters
+from pagination import render_listing
+from filters import format_datetime
+from pool import PooledSQLAlchemy
+import templating
+import instrumentation
+import logs
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -19,7 +26,9 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db = PooledSQLAlchemy(app)
+# before any template is loaded, so every render is timed
+instrumentation.init_app(app)
 
 # TODO: connect to a local postgresql database
 
@@ -27,6 +36,26 @@ db = SQLAlchemy(app)
 # Models.
 #----------------------------------------------------------------------------#
 
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+# genre_id leads the primary key, so listing the artists or venues of a genre
+# is a range scan of that index; the second index serves the reverse lookup
+artist_genres = db.Table('artist_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_artist_id', 'artist_id'),
+)
+
+venue_genres = db.Table('venue_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_venue_id', 'venue_id'),
+)
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
@@ -38,37 +67,249 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    genres = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name, lazy=True)
+    shows = db.relationship('Show', backref='venue', lazy=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        # keyset pagination order for /artists
+        db.Index('ix_artist_name_id', 'name', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    genres = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name, lazy=True)
+    shows = db.relationship('Show', backref='artist', lazy=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        # keyset pagination order for /shows
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        # booking overlap checks: one index range per venue and per artist
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+
+# TODO complete all model properties, as a database migration.
+
+show_counters = ShowCounters(db, Show, [(Venue, Show.venue_id), (Artist, Show.artist_id)])
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Queries.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+def genre_owner(links):
+  # the venue_id or artist_id column of an association table
+  return next(column for column in links.c if column.name != 'genre_id')
+
+def in_genre(model, links, genre):
+  # filter for the venues or artists tagged with `genre`. the genre id is looked
+  # up once in the unique Genre.name index and each candidate is checked with
+  # an EXISTS probe of the (genre_id, owner id) primary key, so the database
+  # can also walk the listing's own index in order and stop after one page
+  genre_id = db.session.query(Genre.id).filter(Genre.name == genre).as_scalar()
+  return db.session.query(links) \
+    .filter(links.c.genre_id == genre_id, genre_owner(links) == model.id) \
+    .exists()
+
+def venues_by_area(genre=None):
+  # one query for the whole listing: num_upcoming_shows is the venue's own
+  # counter (see counters.py), so no show is read or counted per render
+  num_upcoming_shows = Venue.upcoming_shows_count.label('num_upcoming_shows')
+  query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, num_upcoming_shows)
+  if genre:
+    query = query.filter(in_genre(Venue, venue_genres, genre))
+  rows = query \
+    .order_by(Venue.state, Venue.city, Venue.name, Venue.id) \
+    .all()
+
+  areas = []
+  for (city, state), venues in itertools.groupby(rows, key=lambda row: (row.city, row.state)):
+    areas.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": venue.id,
+        "name": venue.name,
+        "num_upcoming_shows": venue.num_upcoming_shows,
+      } for venue in venues]
+    })
+  return areas
+
+def row_to_dict(model, record):
+  return {column.name: getattr(record, column.name) for column in model.__table__.columns}
+
+def record_with_genres(model, links, record_id):
+  # one round trip for a venue or artist and the names of its genres, one row
+  # per genre; returns None when there is no such record
+  rows = db.session.query(model, Genre.name) \
+    .outerjoin(links, genre_owner(links) == model.id) \
+    .outerjoin(Genre, Genre.id == links.c.genre_id) \
+    .filter(model.id == record_id) \
+    .order_by(Genre.name) \
+    .all()
+  if not rows:
+    return None
+  data = row_to_dict(model, rows[0][0])
+  data['genres'] = [name for _, name in rows if name is not None]
+  return data
+
+def shows_with(record_id, show_column, counterpart, prefix):
+  # one query for all of a venue's or artist's shows, joined to the other side
+  # of the booking; the database splits them into past and upcoming and counts
+  # each group with a window function. start_time is naive local time, so it
+  # is compared with the app's clock, not the database's now()
+  is_upcoming = (Show.start_time > datetime.now()).label('is_upcoming')
+  rows = db.session.query(
+      Show.start_time,
+      counterpart.id,
+      counterpart.name,
+      counterpart.image_link,
+      is_upcoming,
+      db.func.count(Show.id).over(partition_by=is_upcoming).label('group_count')
+    ) \
+    .join(counterpart, getattr(Show, prefix + '_id') == counterpart.id) \
+    .filter(show_column == record_id) \
+    .order_by(Show.start_time) \
+    .all()
+
+  result = {
+    'past_shows': [],
+    'upcoming_shows': [],
+    'past_shows_count': 0,
+    'upcoming_shows_count': 0,
+  }
+  for row in rows:
+    group = 'upcoming' if row.is_upcoming else 'past'
+    result[group + '_shows'].append({
+      prefix + '_id': row.id,
+      prefix + '_name': row.name,
+      prefix + '_image_link': row.image_link,
+      'start_time': row.start_time,
+    })
+    result[group + '_shows_count'] = row.group_count
+  return result
+
+def venue_detail(venue_id):
+  # at most two round trips: the venue, then its shows with their artists
+  data = record_with_genres(Venue, venue_genres, venue_id)
+  if data is None:
+    return None
+  data.update(shows_with(venue_id, Show.venue_id, Artist, 'artist'))
+  return data
+
+def artist_detail(artist_id):
+  # at most two round trips: the artist, then its shows with their venues
+  data = record_with_genres(Artist, artist_genres, artist_id)
+  if data is None:
+    return None
+  data.update(shows_with(artist_id, Show.artist_id, Venue, 'venue'))
+  return data
+
+def shows_listing():
+  return db.session.query(
+      Show.id,
+      Show.start_time,
+      Venue.id.label('venue_id'),
+      Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'),
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+    ) \
+    .join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id)
+
+def format_show(row):
+  return {
+    "venue_id": row.venue_id,
+    "venue_name": row.venue_name,
+    "artist_id": row.artist_id,
+    "artist_name": row.artist_name,
+    "artist_image_link": row.artist_image_link,
+    "start_time": row.start_time
+  }
+
+def artists_listing(genre=None):
+  query = db.session.query(Artist.id, Artist.name)
+  if genre:
+    query = query.filter(in_genre(Artist, artist_genres, genre))
+  return query
 
+def format_artist(row):
+  return {
+    "id": row.id,
+    "name": row.name,
+  }
+
+class BookingConflict(Exception):
+  def __init__(self, message, show):
+    super().__init__(message)
+    self.show = show
+
+def show_length():
+  return timedelta(minutes=app.config.get('SHOW_DURATION_MINUTES', 180))
+
+def book_show(artist_id, venue_id, start_time):
+  # adds a show unless the venue or the artist already has one that overlaps it,
+  # raising BookingConflict; LookupError if either does not exist. the caller
+  # commits. the counter watermark, the venue row and then the artist row are
+  # locked first, always in that order: concurrent bookings of the same venue
+  # or artist wait here instead of both passing the check below, and a
+  # rollover, which takes the watermark before updating venues and artists,
+  # cannot hold a row this booking waits for
+  show_counters.watermark(db.session.connection(), lock='share')
+  venue = db.session.query(Venue.id).filter(Venue.id == venue_id).with_for_update().first()
+  artist = db.session.query(Artist.id).filter(Artist.id == artist_id).with_for_update().first()
+  if venue is None or artist is None:
+    raise LookupError('no such %s' % ('venue' if venue is None else 'artist'))
+
+  # shows last show_length(), so two overlap when they start less than that
+  # apart: a bounded range of the (venue_id, start_time) and (artist_id,
+  # start_time) indexes, however many shows there are
+  length = show_length()
+  conflict = db.session.query(Show) \
+    .filter(db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id)) \
+    .filter(Show.start_time > start_time - length, Show.start_time < start_time + length) \
+    .first()
+  if conflict is not None:
+    booked = 'venue' if conflict.venue_id == venue_id else 'artist'
+    raise BookingConflict('The %s already has a show at %s.' % (booked, conflict.start_time), conflict)
+
+  show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
+  db.session.add(show)
+  db.session.flush()
+  return show
+
+venue_search = NameSearch(db, Venue, Venue.upcoming_shows_count, lambda genre: in_genre(Venue, venue_genres, genre))
+artist_search = NameSearch(db, Artist, Artist.upcoming_shows_count, lambda genre: in_genre(Artist, artist_genres, genre))
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+# memoized, see filters.py
 app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
@@ -85,128 +326,26 @@ def index():
 
 @app.route('/venues')
 def venues():
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data=[{
-    "city": "San Francisco",
-    "state": "CA",
-    "venues": [{
-      "id": 1,
-      "name": "The Musical Hop",
-      "num_upcoming_shows": 0,
-    }, {
-      "id": 3,
-      "name": "Park Square Live Music & Coffee",
-      "num_upcoming_shows": 1,
-    }]
-  }, {
-    "city": "New York",
-    "state": "NY",
-    "venues": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }]
+  # num_upcoming_shows is each venue's stored counter, kept current by counters.py
+  # ?genre=Jazz lists only the venues tagged with that genre
+  data = venues_by_area(request.args.get('genre'))
   return render_template('pages/venues.html', areas=data);
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # case-insensitive partial match on the name, ranked, with upcoming show counts.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  response={
-    "count": 1,
-    "data": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }
+  # an optional genre field narrows the results to that genre
+  response = venue_search.search(request.form.get('search_term', ''), request.form.get('genre'))
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    "past_shows": [{
-      "artist_id": 4,
-      "artist_name": "Guns N Petals",
-      "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 2,
-    "name": "The Dueling Pianos Bar",
-    "genres": ["Classical", "R&B", "Hip-Hop"],
-    "address": "335 Delancey Street",
-    "city": "New York",
-    "state": "NY",
-    "phone": "914-003-1132",
-    "website": "https://www.theduelingpianos.com",
-    "facebook_link": "https://www.facebook.com/theduelingpianos",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 3,
-    "name": "Park Square Live Music & Coffee",
-    "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
-    "address": "34 Whiskey Moore Ave",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "415-000-1234",
-    "website": "https://www.parksquarelivemusicandcoffee.com",
-    "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    "past_shows": [{
-      "artist_id": 5,
-      "artist_name": "Matt Quevedo",
-      "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [{
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 1,
-  }
-  data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
+  data = venue_detail(venue_id)
+  if data is None:
+    abort(404)
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -242,110 +381,26 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-  data=[{
-    "id": 4,
-    "name": "Guns N Petals",
-  }, {
-    "id": 5,
-    "name": "Matt Quevedo",
-  }, {
-    "id": 6,
-    "name": "The Wild Sax Band",
-  }]
-  return render_template('pages/artists.html', artists=data)
+  # paginated by (name, id); ?after=<cursor> for the next page, ?stream=1 to stream
+  # ?genre=Jazz lists only the artists tagged with that genre
+  return render_listing('pages/artists.html', artists_listing(request.args.get('genre')), (Artist.name, Artist.id),
+    format_artist, (str, int), 'artists')
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # case-insensitive partial match on the name, ranked, with upcoming show counts.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  response={
-    "count": 1,
-    "data": [{
-      "id": 4,
-      "name": "Guns N Petals",
-      "num_upcoming_shows": 0,
-    }]
-  }
+  # an optional genre field narrows the results to that genre
+  response = artist_search.search(request.form.get('search_term', ''), request.form.get('genre'))
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "past_shows": [{
-      "venue_id": 1,
-      "venue_name": "The Musical Hop",
-      "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 5,
-    "name": "Matt Quevedo",
-    "genres": ["Jazz"],
-    "city": "New York",
-    "state": "NY",
-    "phone": "300-400-5000",
-    "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "past_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 6,
-    "name": "The Wild Sax Band",
-    "genres": ["Jazz", "Classical"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "432-325-5432",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "past_shows": [],
-    "upcoming_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 3,
-  }
-  data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
+  # shows the artist page with the given artist_id
+  data = artist_detail(artist_id)
+  if data is None:
+    abort(404)
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -429,45 +484,9 @@ def create_artist_submission():
 @app.route('/shows')
 def shows():
   # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data=[{
-    "venue_id": 1,
-    "venue_name": "The Musical Hop",
-    "artist_id": 4,
-    "artist_name": "Guns N Petals",
-    "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "start_time": "2019-05-21T21:30:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 5,
-    "artist_name": "Matt Quevedo",
-    "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "start_time": "2019-06-15T23:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-01T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-08T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-15T20:00:00.000Z"
-  }]
-  return render_template('pages/shows.html', shows=data)
+  # paginated by (start_time, id); ?after=<cursor> for the next page, ?stream=1 to stream
+  return render_listing('pages/shows.html', shows_listing(), (Show.start_time, Show.id),
+    format_show, (datetime.fromisoformat, int), 'shows')
 
 @app.route('/shows/create')
 def create_shows():
@@ -478,13 +497,36 @@ def create_shows():
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
-  # TODO: insert form data as a new Show record in the db, instead
+  # a show that overlaps another one at the venue or of the artist is refused
+  form = ShowForm(request.form)
+  try:
+    artist_id = int(form.artist_id.data)
+    venue_id = int(form.venue_id.data)
+  except (TypeError, ValueError):
+    artist_id = venue_id = None
+  if artist_id is None or form.start_time.data is None:
+    flash('An error occurred. Show could not be listed: enter an artist ID, a venue ID and a start time.')
+    return render_template('forms/new_show.html', form=form), 400
+
+  try:
+    book_show(artist_id, venue_id, form.start_time.data)
+    db.session.commit()
+  except BookingConflict as e:
+    db.session.rollback()
+    flash('Show could not be listed. ' + str(e))
+    return render_template('forms/new_show.html', form=form), 409
+  except LookupError:
+    db.session.rollback()
+    flash('An error occurred. Show could not be listed: check the artist and venue IDs.')
+    return render_template('forms/new_show.html', form=form), 400
+  except SQLAlchemyError:
+    db.session.rollback()
+    app.logger.exception('show could not be listed')
+    flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html'), 500
 
   # on successful db insert, flash success
   flash('Show was successfully listed!')
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Show could not be listed.')
-  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
 @app.errorhandler(404)
@@ -497,15 +539,82 @@ def server_error(error):
 
 
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    # JSON lines written by a background thread, see logs.py
+    logs.init_app(app)
     app.logger.info('errors')
 
+# runs after the logging setup so warm-up failures are logged
+templating.init_app(app)
+show_counters.init_app(app)
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+MIGRATE_CHUNK = 10000
+
+def migrate_genres():
+  # moves the comma separated strings of the old Artist.genres column into
+  # Genre and artist_genres, then drops the column. on postgres it all runs
+  # in one transaction, so a failed run leaves the old column in place
+  connection = db.session.connection()
+  for table in (Genre.__table__, artist_genres, venue_genres):
+    table.create(connection, checkfirst=True)
+  columns = {column['name'] for column in db.inspect(connection).get_columns('Artist')}
+  if 'genres' not in columns:
+    return 0
+
+  genre_ids = dict(db.session.query(Genre.name, Genre.id))
+  existing = {(row.genre_id, row.artist_id) for row in db.session.query(artist_genres)}
+  result = connection.execute(db.text('SELECT id, genres FROM "Artist" WHERE genres IS NOT NULL'))
+  linked = 0
+  while True:
+    rows = result.fetchmany(MIGRATE_CHUNK)
+    if not rows:
+      break
+    links = []
+    for artist_id, genres in rows:
+      for name in dict.fromkeys(name.strip() for name in genres.split(',')):
+        if not name:
+          continue
+        if name not in genre_ids:
+          genre_ids[name] = connection.execute(Genre.__table__.insert(), {'name': name}).inserted_primary_key[0]
+        if (genre_ids[name], artist_id) not in existing:
+          links.append({'genre_id': genre_ids[name], 'artist_id': artist_id})
+    if links:
+      connection.execute(artist_genres.insert(), links)
+      linked += len(links)
+
+  connection.execute(db.text('ALTER TABLE "Artist" DROP COLUMN genres'))
+  db.session.commit()
+  return linked
+
+@app.cli.command('migrate-genres')
+def migrate_genres_command():
+  """Move Artist.genres strings into the Genre lookup table."""
+  linked = migrate_genres()
+  click.echo('linked %d artist genres' % linked)
+
+def create_show_indexes():
+  # create_all only builds indexes along with a new table. on postgres they are
+  # built CONCURRENTLY, which cannot run in a transaction, so that bookings
+  # are not blocked while a large Show table is indexed
+  concurrently = db.engine.dialect.name == 'postgresql'
+  with db.engine.connect() as connection:
+    if concurrently:
+      connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+    for index in sorted(Show.__table__.indexes, key=lambda index: index.name):
+      connection.execute('CREATE INDEX %sIF NOT EXISTS %s ON "Show" (%s)' % (
+        'CONCURRENTLY ' if concurrently else '',
+        index.name,
+        ', '.join('"%s"' % column.name for column in index.columns)))
+
+@app.cli.command('create-show-indexes')
+def create_show_indexes_command():
+  """Add the Show indexes to an existing database."""
+  create_show_indexes()
+  click.echo('created the Show indexes')
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
@@ -0,0 +1,55 @@
+'''
+Benchmark for booking a show.
+
+Seeds growing numbers of shows and times book_show(), the venue and artist
+locks plus the overlap check and insert, for random bookings that are
+rolled back afterwards. The time and number of statements per booking
+must stay flat as the Show table grows.
+    python -m benchmarks.bench_booking [shows] [bookings]
+'''
+import random
+import sys
+from datetime import datetime, timedelta
+
+from app import app, db, Show, book_show, BookingConflict
+from benchmarks.common import setup_database, seed, count_queries
+
+
+def plan():
+  # how the database finds overlapping shows
+  start_time = datetime.now()
+  length = timedelta(minutes=app.config.get('SHOW_DURATION_MINUTES', 180))
+  query = db.session.query(Show) \
+    .filter(db.or_(Show.venue_id == 1, Show.artist_id == 1)) \
+    .filter(Show.start_time > start_time - length, Show.start_time < start_time + length)
+  sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+  prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+  return [' '.join(str(value) for value in row) for row in db.session.execute(prefix + sql)]
+
+
+def main(shows=1000000, bookings=1000):
+  venues, artists = 10000, 10000
+  rng = random.Random(1)
+  now = datetime.now()
+  print('%10s %10s %10s %12s' % ('shows', 'conflicts', 'queries', 'us/booking'))
+  for fraction in (0.01, 0.1, 1):
+    ctx = setup_database()
+    seed(venues, artists, int(shows * fraction))
+    conflicts = 0
+    with count_queries() as stats:
+      for _ in range(bookings):
+        try:
+          book_show(rng.randint(1, artists), rng.randint(1, venues),
+                    now + timedelta(minutes=rng.randint(-60 * 24 * 365, 60 * 24 * 365)))
+        except BookingConflict:
+          conflicts += 1
+        db.session.rollback()
+    print('%10d %10d %10.1f %12.1f' % (
+      shows * fraction, conflicts, stats['queries'] / bookings, stats['seconds'] / bookings * 1e6))
+    if fraction == 1:
+      print('\n'.join(plan()))
+    ctx.pop()
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:3]])
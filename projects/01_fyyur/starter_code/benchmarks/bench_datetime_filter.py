@@ -0,0 +1,61 @@
+'''
+Benchmark for the `datetime` Jinja filter.
+
+Renders pages/shows.html with a page of shows through the previous
+filter (dateutil + babel on every call) and through filters.py.
+    python -m benchmarks.bench_datetime_filter [shows]
+'''
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import app
+from filters import format_datetime, format_datetime_cached
+
+
+def format_datetime_before(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def make_shows(count):
+  start = datetime(2035, 1, 1, 20, 0)
+  # shows cluster on a few hundred distinct evenings, as real listings do
+  return [{
+    "venue_id": i % 100,
+    "venue_name": "Venue %d" % (i % 100),
+    "artist_id": i % 1000,
+    "artist_name": "Artist %d" % (i % 1000),
+    "artist_image_link": "",
+    "start_time": (start + timedelta(days=i % 365)).isoformat() + '.000Z',
+  } for i in range(count)]
+
+
+def render(shows, filter):
+  app.jinja_env.filters['datetime'] = filter
+  with app.test_request_context('/shows'):
+    template = app.jinja_env.get_template('pages/shows.html')
+    start = time.perf_counter()
+    template.render(shows=shows)
+    return time.perf_counter() - start
+
+
+def main(count=50000):
+  shows = make_shows(count)
+  print('%d shows' % count)
+  print('%-22s %8.3f s' % ('before', render(shows, format_datetime_before)))
+  format_datetime_cached.cache_clear()
+  print('%-22s %8.3f s' % ('after (cold cache)', render(shows, format_datetime)))
+  print('%-22s %8.3f s' % ('after (warm cache)', render(shows, format_datetime)))
+  app.jinja_env.filters['datetime'] = format_datetime
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:2]])
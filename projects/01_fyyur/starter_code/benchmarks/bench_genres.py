@@ -0,0 +1,98 @@
+'''
+Benchmark for filtering artists by genre.
+
+Seeds `artists` artists with one to three genres each, stored both in the
+Genre and artist_genres tables and, for comparison, as the comma separated
+string of the old Artist.genres column in a separate legacy table. For a
+common and a rare genre it times the first /artists page of that genre and
+the number of artists in it, once with a LIKE '%Genre%' match on the
+string and once through the association table's index.
+    python -m benchmarks.bench_genres [artists] [rounds]
+'''
+import random
+import sys
+import time
+
+from app import db, Artist, Genre, artist_genres, artists_listing
+from benchmarks.common import setup_database, insert_rows
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+          'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre',
+          'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other']
+# most artists play a handful of genres; the rest are rare
+WEIGHTS = [40 if name in ('Rock n Roll', 'Pop', 'Jazz', 'Hip-Hop') else 1 for name in GENRES]
+
+
+def seed(artists, seed=0):
+  rng = random.Random(seed)
+  genres = {i: name for i, name in enumerate(GENRES, 1)}
+  insert_rows(Genre.__table__, ({'id': i, 'name': name} for i, name in genres.items()))
+  insert_rows(Artist.__table__, ({'id': i, 'name': 'Artist %07d' % rng.randrange(10 ** 7)}
+                                 for i in range(1, artists + 1)))
+
+  picked = [sorted(set(rng.choices(list(genres), WEIGHTS, k=rng.randint(1, 3))))
+            for _ in range(artists)]
+  insert_rows(artist_genres, ({'genre_id': genre_id, 'artist_id': artist_id}
+                              for artist_id, ids in enumerate(picked, 1) for genre_id in ids))
+
+  db.session.execute('CREATE TABLE artist_legacy (id INTEGER PRIMARY KEY, name VARCHAR, genres VARCHAR(120))')
+  db.session.execute('CREATE INDEX ix_artist_legacy_name_id ON artist_legacy (name, id)')
+  db.session.execute('INSERT INTO artist_legacy (id, name) SELECT id, name FROM "Artist"')
+  db.session.execute('UPDATE artist_legacy SET genres = :genres WHERE id = :id', [
+    {'id': artist_id, 'genres': ','.join(genres[i] for i in ids)}
+    for artist_id, ids in enumerate(picked, 1)])
+  db.session.commit()
+
+
+def legacy_page(genre):
+  return db.session.execute(
+    "SELECT id, name FROM artist_legacy WHERE genres LIKE :pattern ORDER BY name, id LIMIT 50",
+    {'pattern': '%' + genre + '%'}).fetchall()
+
+
+def legacy_count(genre):
+  return db.session.execute(
+    "SELECT count(*) FROM artist_legacy WHERE genres LIKE :pattern",
+    {'pattern': '%' + genre + '%'}).scalar()
+
+
+def indexed_page(genre):
+  return artists_listing(genre).order_by(Artist.name, Artist.id).limit(50).all()
+
+
+def indexed_count(genre):
+  # counted in the association table's primary key alone
+  return db.session.query(db.func.count()) \
+    .select_from(artist_genres) \
+    .join(Genre, Genre.id == artist_genres.c.genre_id) \
+    .filter(Genre.name == genre) \
+    .scalar()
+
+
+def timed(fn, genre, rounds):
+  fn(genre)
+  start = time.perf_counter()
+  for _ in range(rounds):
+    result = fn(genre)
+  return (time.perf_counter() - start) / rounds, result
+
+
+def main(artists=1000000, rounds=5):
+  ctx = setup_database()
+  start = time.perf_counter()
+  seed(artists)
+  print('seeded %d artists in %.1fs' % (artists, time.perf_counter() - start))
+
+  print('%-12s %-8s %12s %12s %10s' % ('genre', 'query', 'LIKE ms', 'indexed ms', 'rows'))
+  for genre in ('Jazz', 'Folk'):
+    for name, legacy, indexed in (('page', legacy_page, indexed_page), ('count', legacy_count, indexed_count)):
+      legacy_seconds, legacy_result = timed(legacy, genre, rounds)
+      indexed_seconds, indexed_result = timed(indexed, genre, rounds)
+      rows = len(indexed_result) if isinstance(indexed_result, list) else indexed_result
+      assert (len(legacy_result) if isinstance(legacy_result, list) else legacy_result) == rows
+      print('%-12s %-8s %12.2f %12.2f %10d' % (genre, name, legacy_seconds * 1000, indexed_seconds * 1000, rows))
+  ctx.pop()
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:3]])
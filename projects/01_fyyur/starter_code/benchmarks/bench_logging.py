@@ -0,0 +1,134 @@
+'''
+Benchmark for request latency under heavy logging.
+
+Serves a view that logs `lines` INFO records per request from several
+threads at once, first with the synchronous FileHandler Fyyur used to
+attach to app.logger and then with the queue-based pipeline in logs.py,
+and reports the latency percentiles of each. Every run is repeated with
+each write to the log file delayed by `write_ms`, standing in for a slow
+or shared disk. Logs go to a temporary directory unless BENCH_LOG_DIR
+points somewhere else.
+    python -m benchmarks.bench_logging [requests] [lines] [threads] [write_us]
+'''
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from logging import Formatter, FileHandler
+
+from flask import Flask
+from flask.logging import default_handler
+
+import logs
+
+
+def make_app(lines):
+  app = Flask(__name__)
+  # compare the file handlers alone; logs.py drops this one as well
+  app.logger.removeHandler(default_handler)
+
+  @app.route('/')
+  def index():
+    for i in range(lines):
+      app.logger.info('rendering item %d of %d', i, lines)
+    return 'ok'
+
+  return app
+
+
+class SlowFile:
+  '''
+  A file whose every write() takes at least `delay` seconds longer.
+  '''
+
+  def __init__(self, f, delay):
+    self.f = f
+    self.delay = delay
+
+  def write(self, text):
+    time.sleep(self.delay)
+    return self.f.write(text)
+
+  def __getattr__(self, name):
+    return getattr(self.f, name)
+
+
+def slow_down(handler, delay):
+  if delay:
+    open_stream = handler._open
+    handler._open = lambda: SlowFile(open_stream(), delay)
+
+
+def use_file_handler(app, path, delay):
+  # the handler app.py set up before logs.py
+  file_handler = FileHandler(path, delay=True)
+  slow_down(file_handler, delay)
+  file_handler.setFormatter(
+    Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+  )
+  app.logger.setLevel(logging.INFO)
+  file_handler.setLevel(logging.INFO)
+  app.logger.addHandler(file_handler)
+
+  def stop():
+    # every app of this module shares one logger
+    app.logger.removeHandler(file_handler)
+    file_handler.close()
+  return stop
+
+
+def use_queue(app, path, delay):
+  app.config['LOG_FILE'] = path
+  listener = logs.init_app(app)
+  # nothing has been logged yet, so the file is not open
+  slow_down(listener.handlers[0], delay)
+  return lambda: logs.stop(app)
+
+
+def measure(app, requests, threads):
+  latencies = []
+  lock = threading.Lock()
+  per_thread = requests // threads
+
+  def worker():
+    client = app.test_client()
+    times = []
+    for _ in range(per_thread):
+      start = time.perf_counter()
+      client.get('/')
+      times.append(time.perf_counter() - start)
+    with lock:
+      latencies.extend(times)
+
+  workers = [threading.Thread(target=worker) for _ in range(threads)]
+  start = time.perf_counter()
+  for thread in workers:
+    thread.start()
+  for thread in workers:
+    thread.join()
+  seconds = time.perf_counter() - start
+  latencies.sort()
+  return seconds, [latencies[int(len(latencies) * p)] for p in (0.5, 0.9, 0.99)]
+
+
+def main(requests=2000, lines=20, threads=8, write_us=200):
+  directory = tempfile.mkdtemp(dir=os.environ.get('BENCH_LOG_DIR'))
+  print('%d requests x %d log lines, %d threads' % (requests, lines, threads))
+  print('%-12s %9s %10s %10s %10s %10s' % ('handler', 'write us', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms'))
+  for delay in sorted({0, write_us}):
+    for name, setup in (('FileHandler', use_file_handler), ('logs.py', use_queue)):
+      app = make_app(lines)
+      path = os.path.join(directory, '%s-%d.log' % (name, delay))
+      stop = setup(app, path, delay / 1e6)
+      try:
+        seconds, percentiles = measure(app, requests, threads)
+      finally:
+        stop()
+      print('%-12s %9d %10.0f %10.2f %10.2f %10.2f' % (
+        name, delay, requests / seconds, *[p * 1000 for p in percentiles]))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:5]])
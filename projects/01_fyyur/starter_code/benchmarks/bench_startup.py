@@ -0,0 +1,62 @@
+'''
+Startup benchmark: time to first response of a fresh worker.
+
+Each run starts a new Python process, imports the app and times the first
+request to every listing page, with and without the template bytecode
+cache and the boot-time warm-up.
+    python -m benchmarks.bench_startup [runs]
+'''
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = '''
+import json, time
+start = time.perf_counter()
+from app import app
+booted = time.perf_counter()
+client = app.test_client()
+first = {}
+for path in %r:
+  t = time.perf_counter()
+  client.get(path)
+  first[path] = time.perf_counter() - t
+print(json.dumps({'boot': booted - start, 'first': first}))
+'''
+
+PATHS = ['/', '/venues', '/artists', '/shows']
+
+
+def run(env, code):
+  out = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+  return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main(runs=5):
+  workdir = tempfile.mkdtemp()
+  env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(workdir, 'fyyur.db'))
+  subprocess.run([sys.executable, '-c', 'from app import app, db\nwith app.app_context(): db.create_all()'],
+                 env=dict(env, TEMPLATE_CACHE_DIR=''), check=True, stderr=subprocess.DEVNULL)
+
+  cache_dir = os.path.join(workdir, 'jinja_cache')
+  modes = [
+    ('no bytecode cache', dict(env, TEMPLATE_CACHE_DIR='')),
+    ('shared bytecode cache', dict(env, TEMPLATE_CACHE_DIR=cache_dir)),
+    ('cache + warm-up', dict(env, TEMPLATE_CACHE_DIR=cache_dir, WARM_UP_ON_BOOT='true')),
+  ]
+  # fill the shared cache once, as `flask compile-templates` would at deploy time
+  run(dict(env, TEMPLATE_CACHE_DIR=cache_dir), CHILD % PATHS)
+
+  print('%-24s %10s %18s %18s' % ('mode', 'boot ms', 'first request ms', 'boot+first ms'))
+  for name, mode_env in modes:
+    results = [run(mode_env, CHILD % PATHS) for _ in range(runs)]
+    boot = min(r['boot'] for r in results) * 1000
+    first = min(sum(r['first'].values()) for r in results) * 1000
+    print('%-24s %10.1f %18.1f %18.1f' % (name, boot, first, boot + first))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:2]])
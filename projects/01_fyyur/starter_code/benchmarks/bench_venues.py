@@ -0,0 +1,27 @@
+'''
+Benchmark for the /venues listing.
+
+Seeds growing numbers of venues and shows and reports how many SQL
+statements and how long venues_by_area() takes at each size. The query
+count must stay constant as the data grows.
+    python -m benchmarks.bench_venues [venues] [shows]
+'''
+import sys
+
+from app import venues_by_area
+from benchmarks.common import setup_database, seed, count_queries
+
+
+def main(venues=10000, shows=1000000):
+  print('%10s %10s %8s %10s' % ('venues', 'shows', 'queries', 'seconds'))
+  for fraction in (0.01, 0.1, 1):
+    ctx = setup_database()
+    seed(max(1, int(venues * fraction)), 1000, int(shows * fraction))
+    with count_queries() as stats:
+      venues_by_area()
+    print('%10d %10d %8d %10.3f' % (venues * fraction, shows * fraction, stats['queries'], stats['seconds']))
+    ctx.pop()
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,82 @@
+'''
+Shared helpers for the Fyyur benchmarks.
+
+The benchmarks run against a throwaway SQLite database by default; set
+BENCH_DATABASE_URL to a postgres URL to benchmark a real server instead.
+Run them from the starter_code directory, e.g.
+    python -m benchmarks.bench_venues
+'''
+import contextlib
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import app, db, Venue, Artist, Show, show_counters
+
+DATABASE_URL = os.environ.get('BENCH_DATABASE_URL', 'sqlite://')
+CHUNK = 50000
+
+
+def setup_database():
+  app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+  app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+  ctx = app.app_context()
+  ctx.push()
+  db.drop_all()
+  db.create_all()
+  return ctx
+
+
+def insert_rows(table, rows):
+  rows = list(rows)
+  for i in range(0, len(rows), CHUNK):
+    db.session.execute(table.insert(), rows[i:i + CHUNK])
+  db.session.commit()
+
+
+def seed(venues, artists, shows, seed=0):
+  rng = random.Random(seed)
+  cities = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+            ('Chicago', 'IL'), ('Seattle', 'WA'), ('Denver', 'CO')]
+  now = datetime.now()
+
+  insert_rows(Venue.__table__, ({
+    'id': i,
+    'name': 'Venue %d' % i,
+    'city': cities[i % len(cities)][0],
+    'state': cities[i % len(cities)][1],
+  } for i in range(1, venues + 1)))
+  insert_rows(Artist.__table__, ({
+    'id': i,
+    'name': 'Artist %d' % i,
+    'city': cities[i % len(cities)][0],
+    'state': cities[i % len(cities)][1],
+  } for i in range(1, artists + 1)))
+  insert_rows(Show.__table__, ({
+    'id': i,
+    'venue_id': rng.randint(1, venues),
+    'artist_id': rng.randint(1, artists),
+    'start_time': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+  } for i in range(1, shows + 1)))
+  # bulk inserts skip the ORM hooks that keep the show counters
+  show_counters.check(fix=True)
+
+
+@contextlib.contextmanager
+def count_queries():
+  # yields a dict that is filled with the number of statements and wall time
+  stats = {'queries': 0, 'seconds': 0.0}
+
+  def before_cursor_execute(*args):
+    stats['queries'] += 1
+
+  event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+  start = time.perf_counter()
+  try:
+    yield stats
+  finally:
+    stats['seconds'] = time.perf_counter() - start
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
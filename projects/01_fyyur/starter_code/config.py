@@ -6,8 +6,54 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
+# Compiled templates are cached here and shared by all workers; set to '' to disable.
+# Unset, Jinja's own per-user directory in the system temp directory is used, which it
+# creates with mode 0700 and refuses to use when another user owns it.
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+
+# Pre-render the home and listing pages when a worker boots.
+WARM_UP_ON_BOOT = os.environ.get('WARM_UP_ON_BOOT', 'false') == 'true'
+
 # Connect to the database
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = '<Put your local database url>'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', '<Put your local database url>')
+
+# Connection pool; each value can also be set through an environment variable of the same name.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+# Seconds a request waits for a free connection before failing.
+DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+# Seconds before a connection is replaced, -1 to keep connections forever.
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', 'true') == 'true'
+# Milliseconds before PostgreSQL cancels a query, 0 to disable.
+DATABASE_STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT', 0))
+# Live pool metrics for internal monitoring, e.g. /internal/db-pool; off unless set.
+DATABASE_POOL_METRICS_URL = os.environ.get('DATABASE_POOL_METRICS_URL', '')
+
+# Request metrics in the Prometheus text format for internal scraping, e.g. /internal/metrics; off unless set.
+METRICS_URL = os.environ.get('METRICS_URL', '')
+# Share of requests run under cProfile, e.g. 0.01; 0 disables profiling.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# Profiles of the slowest sampled requests are kept here.
+PROFILE_SLOWEST = int(os.environ.get('PROFILE_SLOWEST', 10))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+
+# Application log, written as JSON lines by a background thread when DEBUG is off.
+# Every worker appends to the same file; rotate it externally, e.g. with logrotate.
+LOG_FILE = os.environ.get('LOG_FILE', os.path.join(basedir, 'error.log'))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Records waiting for the writer; once it is full new records are dropped.
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# Records written per flush while the writer is busy.
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 256))
+# Above this share of LOG_QUEUE_SIZE only LOG_SAMPLE_RATE of INFO and DEBUG records are kept.
+LOG_PRESSURE = float(os.environ.get('LOG_PRESSURE', 0.8))
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+# Log one line per request with its status and latency.
+LOG_REQUESTS = os.environ.get('LOG_REQUESTS', 'false') == 'true'
+
+# Shows at the same venue or of the same artist must start at least this far apart.
+SHOW_DURATION_MINUTES = int(os.environ.get('SHOW_DURATION_MINUTES', 180))
@@ -0,0 +1,224 @@
+#----------------------------------------------------------------------------#
+# Materialized upcoming and past show counters for venues and artists.
+#
+# Every venue and artist row carries upcoming_shows_count and
+# past_shows_count, so the listing and search pages read them instead of
+# counting shows on each render. The split is made at a watermark, the
+# time of the last rollover: a show is upcoming while it starts after the
+# watermark. Show inserts, updates and deletes adjust the counters in the
+# same transaction, a periodic rollover moves the shows that have started
+# since the last one from upcoming to past, and check() recomputes every
+# counter from the Show table to report, and optionally repair, drift.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+import click
+from sqlalchemy import bindparam, case, event, func, inspect
+
+UPCOMING = 'upcoming_shows_count'
+PAST = 'past_shows_count'
+
+
+class ShowCounters:
+    '''
+    Keeps the counters of each `owners` model up to date, where `owners`
+    pairs a model with its foreign key on `show_model`, e.g.
+    [(Venue, Show.venue_id), (Artist, Show.artist_id)].
+    '''
+
+    def __init__(self, db, show_model, owners):
+        self.db = db
+        self.show_model = show_model
+        self.owners = owners
+        # one row holding the watermark
+        self.state = db.Table(
+            'show_counter_state',
+            db.Column('id', db.Integer, primary_key=True),
+            db.Column('rolled_until', db.DateTime, nullable=False),
+        )
+        event.listen(self.state, 'after_create', self._insert_state)
+        event.listen(show_model, 'after_insert', self._on_insert)
+        event.listen(show_model, 'after_delete', self._on_delete)
+        event.listen(show_model, 'after_update', self._on_update)
+
+    def _insert_state(self, target, connection, **kw):
+        connection.execute(self.state.insert(), {'id': 1, 'rolled_until': datetime.now()})
+
+    def watermark(self, connection, lock=False):
+        '''
+        Returns the time of the last rollover. lock=True holds it until the
+        transaction ends: shared, so writers keep the watermark they counted
+        against until they commit; exclusive for the rollover that moves it.
+
+        Every show write takes the shared lock on this one row. Writers do
+        not block each other on PostgreSQL, where FOR SHARE locks coexist,
+        but a rollover waits for every write in flight and writes that
+        arrive meanwhile queue behind it. Keep rollovers short and frequent
+        so that stall stays brief. SQLite ignores FOR SHARE and serializes
+        all writes anyway; the exclusive lock is taken with an UPDATE that
+        leaves the row as it is, so on SQLite it also starts the write
+        transaction before the rollover reads anything.
+
+        Take it before locking or updating any owner row: the rollover holds
+        it exclusively while it updates venues and artists, so a writer that
+        locked one of those rows first and then waited here would deadlock
+        with it.
+        '''
+        query = self.db.select([self.state.c.rolled_until]).where(self.state.c.id == 1)
+        if lock == 'share':
+            query = query.with_for_update(read=True)
+        elif lock:
+            connection.execute(self.state.update().where(self.state.c.id == 1)
+                               .values(rolled_until=self.state.c.rolled_until))
+        return connection.execute(query).scalar()
+
+    def _adjust(self, connection, start_time, keys, step):
+        column = UPCOMING if start_time > self.watermark(connection, lock='share') else PAST
+        for (model, _), key in zip(self.owners, keys):
+            table = model.__table__
+            connection.execute(
+                table.update().where(table.c.id == key).values({column: table.c[column] + step}))
+
+    def _keys(self, show):
+        return [getattr(show, fk.key) for _, fk in self.owners]
+
+    def _on_insert(self, mapper, connection, target):
+        self._adjust(connection, target.start_time, self._keys(target), 1)
+
+    def _on_delete(self, mapper, connection, target):
+        self._adjust(connection, target.start_time, self._keys(target), -1)
+
+    def _on_update(self, mapper, connection, target):
+        state = inspect(target)
+        names = ['start_time'] + [fk.key for _, fk in self.owners]
+        old = {}
+        for name in names:
+            history = state.attrs[name].history
+            old[name] = history.deleted[0] if history.deleted else getattr(target, name)
+        if all(old[name] == getattr(target, name) for name in names):
+            return
+        self._adjust(connection, old['start_time'], [old[fk.key] for _, fk in self.owners], -1)
+        self._adjust(connection, target.start_time, self._keys(target), 1)
+
+    def rollover(self, now=None):
+        '''
+        Moves the shows that started since the last rollover from upcoming to
+        past and returns how many shows moved. Touches only the venues and
+        artists of those shows, however many shows there are in total.
+        '''
+        now = now or datetime.now()
+        Show = self.show_model
+        connection = self.db.session.connection()
+        since = self.watermark(connection, lock=True)
+        if now <= since:
+            self.db.session.rollback()
+            return 0
+
+        moved = 0
+        for model, fk in self.owners:
+            rows = self.db.session.query(fk, func.count()) \
+                .filter(Show.start_time > since, Show.start_time <= now) \
+                .group_by(fk) \
+                .all()
+            if rows:
+                table = model.__table__
+                connection.execute(
+                    table.update()
+                        .where(table.c.id == bindparam('owner_id'))
+                        .values({
+                            UPCOMING: table.c[UPCOMING] - bindparam('shows'),
+                            PAST: table.c[PAST] + bindparam('shows'),
+                        }),
+                    [{'owner_id': owner_id, 'shows': shows} for owner_id, shows in rows])
+            # the same shows for every owner model
+            moved = sum(shows for _, shows in rows)
+
+        connection.execute(self.state.update().where(self.state.c.id == 1).values(rolled_until=now))
+        self.db.session.commit()
+        return moved
+
+    def check(self, fix=False):
+        '''
+        Recounts every venue's and artist's shows in one grouped query per
+        model and returns the rows whose counters differ, as dicts of the
+        model name, id, stored and actual counts. fix=True writes the actual
+        counts back.
+        '''
+        Show = self.show_model
+        connection = self.db.session.connection()
+        since = self.watermark(connection, lock=fix)
+
+        drift = []
+        for model, fk in self.owners:
+            counts = self.db.session.query(
+                fk.label('owner_id'),
+                func.sum(case([(Show.start_time > since, 1)], else_=0)).label('upcoming'),
+                func.sum(case([(Show.start_time > since, 0)], else_=1)).label('past'),
+            ).group_by(fk).subquery()
+            upcoming = func.coalesce(counts.c.upcoming, 0)
+            past = func.coalesce(counts.c.past, 0)
+            rows = self.db.session.query(
+                model.id, getattr(model, UPCOMING), getattr(model, PAST), upcoming, past
+            ).outerjoin(counts, counts.c.owner_id == model.id) \
+                .filter(self.db.or_(getattr(model, UPCOMING) != upcoming, getattr(model, PAST) != past)) \
+                .order_by(model.id) \
+                .all()
+            drift.extend({
+                'model': model.__name__,
+                'id': id,
+                'stored': (stored_upcoming, stored_past),
+                'actual': (actual_upcoming, actual_past),
+            } for id, stored_upcoming, stored_past, actual_upcoming, actual_past in rows)
+
+            if fix and rows:
+                table = model.__table__
+                connection.execute(
+                    table.update()
+                        .where(table.c.id == bindparam('owner_id'))
+                        .values({UPCOMING: bindparam('upcoming'), PAST: bindparam('past')}),
+                    [{'owner_id': row[0], 'upcoming': row[3], 'past': row[4]} for row in rows])
+
+        if fix:
+            self.db.session.commit()
+        return drift
+
+    def migrate(self):
+        '''
+        Adds the counter columns and the watermark to a database created
+        without them, then fills the counters. Safe to run again.
+        '''
+        connection = self.db.session.connection()
+        self.state.create(connection, checkfirst=True)
+        for model, _ in self.owners:
+            table = model.__table__
+            existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+            for name in (UPCOMING, PAST):
+                if name not in existing:
+                    connection.execute('ALTER TABLE "%s" ADD COLUMN %s INTEGER NOT NULL DEFAULT 0' % (table.name, name))
+        self.db.session.commit()
+        return self.check(fix=True)
+
+    def init_app(self, app):
+        @app.cli.group('show-counters')
+        def show_counters():
+            """Maintain the upcoming and past show counters."""
+
+        @show_counters.command('rollover')
+        def rollover_command():
+            """Move started shows from upcoming to past; run it every few minutes."""
+            click.echo('moved %d shows to past' % self.rollover())
+
+        @show_counters.command('check')
+        @click.option('--fix', is_flag=True, help='Write the recounted values back.')
+        def check_command(fix):
+            """Recount every counter and report the ones that drifted."""
+            drift = self.check(fix=fix)
+            for row in drift:
+                click.echo('%(model)s %(id)d: stored %(stored)s, actual %(actual)s' % row)
+            click.echo('%d counters drifted%s' % (len(drift), ', fixed' if fix and drift else ''))
+
+        @show_counters.command('migrate')
+        def migrate_command():
+            """Add the counters to an existing database and fill them."""
+            click.echo('filled the counters of %d rows' % len(self.migrate()))
@@ -0,0 +1,49 @@
+#----------------------------------------------------------------------------#
+# Datetime formatting for the `datetime` Jinja filter.
+#
+# The filter runs once per show on every listing page, so formatted values
+# are memoized on (value, format, locale). ISO-8601 strings skip dateutil's
+# fuzzy parser and datetime objects coming from the database are formatted
+# directly.
+#----------------------------------------------------------------------------#
+
+import functools
+from datetime import datetime
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+CACHE_SIZE = 8192
+
+FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+
+def parse_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  text = value.strip()
+  if text.endswith('Z'):
+    text = text[:-1] + '+00:00'
+  try:
+    return datetime.fromisoformat(text)
+  except ValueError:
+    return dateutil.parser.parse(value)
+
+
+@functools.lru_cache(maxsize=64)
+def get_locale(locale):
+  return Locale.parse(locale)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def format_datetime_cached(value, format, locale):
+  pattern = FORMATS.get(format, format)
+  return babel.dates.format_datetime(parse_datetime(value), pattern, locale=get_locale(locale))
+
+
+def format_datetime(value, format='medium', locale=None):
+  return format_datetime_cached(value, format, locale or babel.dates.LC_TIME)
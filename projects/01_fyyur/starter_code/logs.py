@@ -0,0 +1,292 @@
+#----------------------------------------------------------------------------#
+# Non-blocking application logging.
+#
+# Log calls on a request thread only put the record on a bounded queue.
+# A background QueueListener thread formats the records as JSON lines,
+# each with the request id and the time since the request started, and
+# appends them to LOG_FILE in batches. Rotation is left to an external tool
+# such as logrotate: the file is reopened once it has been moved, so any
+# number of worker processes can share it. When the writer falls behind,
+# INFO and DEBUG records are sampled and, once the queue is full, dropped,
+# so logging never stalls a request; the number lost is written to the log
+# when the queue drains.
+#----------------------------------------------------------------------------#
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# used when the app config does not set a value
+DEFAULTS = {
+    'LOG_FILE': 'error.log',
+    'LOG_LEVEL': 'INFO',
+    'LOG_QUEUE_SIZE': 10000,
+    'LOG_BATCH_SIZE': 256,
+    'LOG_PRESSURE': 0.8,
+    'LOG_SAMPLE_RATE': 0.1,
+    'LOG_REQUESTS': False,
+}
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+def setting(app, name):
+    value = app.config.get(name)
+    return DEFAULTS[name] if value is None else value
+
+
+class JSONFormatter(logging.Formatter):
+    '''
+    Formats a record as one JSON object per line.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'latency_ms': getattr(record, 'latency_ms', None),
+            'source': '{}:{}'.format(record.pathname, record.lineno),
+        }
+        for name in ('method', 'path', 'status'):
+            if hasattr(record, name):
+                entry[name] = getattr(record, name)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class BoundedQueueHandler(QueueHandler):
+    '''
+    Puts records on a bounded queue without ever blocking the caller.
+
+    Above `pressure` (the share of the queue in use) records below WARNING
+    are only kept at `sample_rate`; records that do not fit are dropped.
+    Both are counted until take_lost() collects them.
+    '''
+
+    def __init__(self, queue, pressure=0.8, sample_rate=0.1):
+        super().__init__(queue)
+        self.pressure_mark = max(1, int(queue.maxsize * pressure)) if queue.maxsize else 0
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self.sampled_out = 0
+        self._counter_lock = threading.Lock()
+
+    def prepare(self, record):
+        # runs on the logging thread: resolve everything that must not
+        # outlive the call (arguments, traceback, request context) here
+        # and leave the JSON formatting to the writer thread
+        if record.exc_info or record.stack_info:
+            # other handlers still need the traceback
+            record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        if not hasattr(record, 'request_id'):
+            record.request_id = None
+            if has_request_context():
+                record.request_id = g.get('request_id')
+                start = g.get('request_start')
+                if start is not None:
+                    record.latency_ms = round((time.perf_counter() - start) * 1000, 3)
+        return record
+
+    def emit(self, record):
+        if (record.levelno < logging.WARNING and self.pressure_mark
+                and self.queue.qsize() >= self.pressure_mark
+                and random.random() >= self.sample_rate):
+            self._count('sampled_out')
+            return
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self._count('dropped')
+        except Exception:
+            self.handleError(record)
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def take_lost(self):
+        with self._counter_lock:
+            lost = (self.dropped, self.sampled_out)
+            self.dropped = self.sampled_out = 0
+        return lost
+
+
+class BatchingWatchedFileHandler(WatchedFileHandler):
+    '''
+    A WatchedFileHandler that writes `batch_size` records at a time instead
+    of one. The listener calls flush() whenever the queue runs empty, so a
+    record waits at most until the end of a burst.
+
+    Each batch is appended with a single unbuffered write(), so the lines of
+    several processes sharing the file do not interleave, and the file is
+    reopened before a batch if it has been moved or deleted.
+    '''
+
+    def __init__(self, filename, batch_size=256):
+        super().__init__(filename, encoding='utf-8', delay=True)
+        self.batch_size = batch_size
+        self._batch = []
+        self._last_record = None
+
+    def emit(self, record):
+        try:
+            self._batch.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        self._last_record = record
+        if len(self._batch) >= self.batch_size:
+            self._write_batch()
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write_batch()
+        finally:
+            self.release()
+
+    def _write_batch(self):
+        if not self._batch:
+            return
+        text = ''.join(self._batch)
+        self._batch = []
+        try:
+            self.reopenIfNeeded()
+            if self.stream is None:
+                self.stream = self._open()
+                self._statstream()
+            data = text.encode(self.encoding)
+            written = 0
+            while written < len(data):
+                written += self.stream.write(data[written:])
+        except Exception:
+            self.handleError(self._last_record)
+
+    def _open(self):
+        # unbuffered, so a batch reaches the file in one write() call
+        return open(self.baseFilename, 'ab', buffering=0)
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class BatchingQueueListener(QueueListener):
+    '''
+    Hands every record on the queue to the handlers. Each time the queue
+    runs empty it logs how many records `queue_handler` lost since the
+    last time, if any, and flushes the handlers.
+    '''
+
+    def __init__(self, queue, handler, queue_handler):
+        super().__init__(queue, handler, respect_handler_level=True)
+        self.queue_handler = queue_handler
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        dropped, sampled_out = self.queue_handler.take_lost()
+        if dropped or sampled_out:
+            # handled here rather than returned, since the monitor thread
+            # marks every returned record done on the queue
+            self.handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': 'log queue backpressure: dropped %d records, sampled out %d' % (dropped, sampled_out),
+                'request_id': None,
+            }))
+        for handler in self.handlers:
+            handler.flush()
+        return self.queue.get(block)
+
+    def enqueue_sentinel(self):
+        # waits for room, a full queue must not lose the stop signal
+        self.queue.put(self._sentinel)
+
+
+def start_request():
+    # ids need to be unique, not unguessable, and os.urandom can be slow
+    g.request_id = request.headers.get(REQUEST_ID_HEADER) or '%032x' % random.getrandbits(128)
+    g.request_start = time.perf_counter()
+
+
+def add_request_id(response):
+    request_id = g.get('request_id')
+    if request_id is not None:
+        response.headers.setdefault(REQUEST_ID_HEADER, request_id)
+    return response
+
+
+def init_app(app):
+    '''
+    Sends the records of `app.logger` through a bounded queue to a batching
+    JSON lines file, and tags every request with an id that is echoed in
+    the X-Request-ID response header. Returns the listener.
+    '''
+    log_queue = queue.Queue(int(setting(app, 'LOG_QUEUE_SIZE')))
+    queue_handler = BoundedQueueHandler(
+        log_queue, float(setting(app, 'LOG_PRESSURE')), float(setting(app, 'LOG_SAMPLE_RATE')))
+
+    file_handler = BatchingWatchedFileHandler(
+        setting(app, 'LOG_FILE'), batch_size=int(setting(app, 'LOG_BATCH_SIZE')))
+    file_handler.setFormatter(JSONFormatter())
+
+    listener = BatchingQueueListener(log_queue, file_handler, queue_handler)
+    listener.start()
+    # writes out whatever is still queued when the process exits
+    atexit.register(stop, app)
+
+    app.logger.setLevel(setting(app, 'LOG_LEVEL'))
+    # flask's stderr handler would still write on the request thread
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(queue_handler)
+    app.extensions['logs'] = listener
+
+    app.before_request(start_request)
+    app.after_request(add_request_id)
+
+    if setting(app, 'LOG_REQUESTS'):
+        @app.after_request
+        def log_request(response):
+            app.logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+            })
+            return response
+
+    return listener
+
+
+def stop(app):
+    '''
+    Stops the writer thread after it has written everything already queued.
+    '''
+    listener = app.extensions.pop('logs', None)
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    app.logger.removeHandler(listener.queue_handler)
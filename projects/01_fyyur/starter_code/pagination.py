@@ -0,0 +1,102 @@
+#----------------------------------------------------------------------------#
+# Keyset pagination and streamed rendering for the listing pages.
+#
+# Listings are ordered by a unique key such as (start_time, id) or
+# (name, id). A page starts strictly after the key of the last row of the
+# previous page, so the database seeks straight to it through an index
+# instead of counting past every skipped row as OFFSET does.
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request, url_for, abort, stream_with_context, Response, render_template
+from sqlalchemy import tuple_
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# streamed pages never hold the rendered page in memory, so they may be larger
+MAX_STREAM_PAGE_SIZE = 5000
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, types):
+    # types converts each cursor value back, e.g. (datetime.fromisoformat, int)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        return [convert(value) for convert, value in zip(types, values)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def wants_stream():
+    return request.args.get('stream', '') in ('1', 'true')
+
+
+def page_size():
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    maximum = MAX_STREAM_PAGE_SIZE if wants_stream() else MAX_PAGE_SIZE
+    return max(1, min(limit, maximum))
+
+
+class KeysetPage:
+    '''
+    One page of a keyset-paginated query, iterated by the template.
+
+    The query is asked for one row more than the page size; if that row
+    exists there is a next page, which starts after the last row shown.
+    next_cursor and next_url are only known once the rows have been
+    iterated, which lets a streamed template render them after its loop.
+    '''
+
+    def __init__(self, query, keys, format, cursor_types, stream=False):
+        self.limit = page_size()
+        self.keys = keys
+        self.format = format
+        self.next_cursor = None
+
+        cursor = request.args.get('after')
+        if cursor:
+            query = query.filter(tuple_(*keys) > tuple_(*decode_cursor(cursor, cursor_types)))
+        query = query.order_by(*keys).limit(self.limit + 1)
+        # a streamed page fetches rows in batches while the HTML is written
+        self.rows = query.yield_per(100) if stream else query.all()
+
+    def __iter__(self):
+        last = None
+        for count, row in enumerate(self.rows):
+            if count == self.limit:
+                self.next_cursor = encode_cursor([getattr(last, key.key) for key in self.keys])
+                break
+            last = row
+            yield self.format(row)
+
+    @property
+    def next_url(self):
+        if self.next_cursor is None:
+            return None
+        args = request.args.to_dict()
+        args['after'] = self.next_cursor
+        return url_for(request.endpoint, **args)
+
+
+def render_listing(template_name, query, keys, format, cursor_types, name):
+    '''
+    Renders one keyset page of `query` as `name` in the template, either
+    in one go or, with ?stream=1, flushed incrementally as it renders.
+    '''
+    stream = wants_stream()
+    context = {name: KeysetPage(query, keys, format, cursor_types, stream=stream)}
+    if not stream:
+        return render_template(template_name, **context)
+
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
@@ -0,0 +1,224 @@
+#----------------------------------------------------------------------------#
+# Name search for venues and artists.
+#
+# On PostgreSQL the search is a single ILIKE query served by a pg_trgm GIN
+# index and ranked by trigram similarity. Other databases (SQLite in tests)
+# fall back to an in-process n-gram index to find matching ids, then fetch
+# those rows in one query. Either way num_upcoming_shows comes back with the
+# results, read from the counters kept by counters.py.
+#----------------------------------------------------------------------------#
+
+import threading
+
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import Session, object_session
+
+SEARCH_LIMIT = 50
+
+
+def like_pattern(term):
+    # escape LIKE wildcards so a search for "100%" is a literal match
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%' + escaped + '%'
+
+
+def normalize(text):
+    return (text or '').casefold()
+
+
+class NGramIndex:
+    '''
+    In-memory substring index mapping every n-gram of a name to the ids
+    that contain it. A search intersects the posting sets of the term's
+    n-grams and confirms the candidates with a substring check.
+    '''
+
+    def __init__(self, n=3):
+        self.n = n
+        self._texts = {}
+        self._postings = {}
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _grams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, id, text):
+        self.remove(id)
+        text = normalize(text)
+        self._texts[id] = text
+        for gram in self._grams(text):
+            self._postings.setdefault(gram, set()).add(id)
+
+    def remove(self, id):
+        text = self._texts.pop(id, None)
+        if text is None:
+            return
+        for gram in self._grams(text):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, term, limit=SEARCH_LIMIT):
+        '''
+        Returns (ids, total): up to `limit` matching ids, best match first,
+        and the total number of matches.
+        '''
+        term = normalize(term)
+        if len(term) < self.n:
+            # too short to have an n-gram; check every name
+            candidates = self._texts.keys()
+        else:
+            postings = sorted((self._postings.get(gram, ()) for gram in self._grams(term)), key=len)
+            candidates = set.intersection(*postings) if postings[0] else ()
+
+        texts = self._texts
+        matches = [id for id in candidates if term in texts[id]]
+        # prefix matches first, then earlier matches, then shorter names
+        matches.sort(key=lambda id: (texts[id].find(term), len(texts[id]), id))
+        return matches[:limit], len(matches)
+
+
+class NameSearch:
+    '''
+    Case-insensitive partial name search over `model`, reporting the number
+    of upcoming shows read from `upcoming_column` (see counters.py).
+    `genre_filter(genre)` returns the filter clause for the rows tagged with
+    a genre, used to narrow a search to one genre.
+
+    The n-gram index behind the non-PostgreSQL fallback is kept per process.
+    Changes made through this process's sessions are applied to it once they
+    commit, and dropped if they roll back. Rows written by other processes
+    only show up after reset() or a restart.
+    '''
+
+    def __init__(self, db, model, upcoming_column, genre_filter=None, limit=SEARCH_LIMIT):
+        self.db = db
+        self.model = model
+        self.upcoming_column = upcoming_column
+        self.genre_filter = genre_filter
+        self.limit = limit
+        self._index = None
+        self._lock = threading.Lock()
+
+        # the trigram index only exists on postgres; other databases use NGramIndex
+        table = model.__table__
+        event.listen(table, 'before_create', DDL(
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+        ).execute_if(dialect='postgresql'))
+        event.listen(table, 'after_create', DDL(
+            'CREATE INDEX IF NOT EXISTS ix_%s_name_trgm ON %%(fullname)s USING gin (name gin_trgm_ops)'
+            % table.name.lower()
+        ).execute_if(dialect='postgresql'))
+        event.listen(model, 'after_insert', self._on_save)
+        event.listen(model, 'after_update', self._on_save)
+        event.listen(model, 'after_delete', self._on_delete)
+        event.listen(Session, 'after_commit', self._on_commit)
+        event.listen(Session, 'after_rollback', self._on_rollback)
+
+    def uses_trigram_index(self):
+        return self.db.engine.dialect.name == 'postgresql'
+
+    def search(self, term, genre=None):
+        '''
+        Returns {"count": total matches, "data": [{id, name, num_upcoming_shows}]}
+        '''
+        if genre and self.genre_filter is None:
+            raise ValueError('%s has no genres to filter on' % self.model.__name__)
+        if self.uses_trigram_index():
+            return self._search_trigram(term, genre)
+        return self._search_ngram(term, genre)
+
+    def _query(self):
+        model = self.model
+        return self.db.session.query(
+            model.id,
+            model.name,
+            self.upcoming_column.label('num_upcoming_shows')
+        )
+
+    @staticmethod
+    def _format(row):
+        return {
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows,
+        }
+
+    def _search_trigram(self, term, genre=None):
+        model = self.model
+        query = self._query() \
+            .add_columns(self.db.func.count().over().label('total')) \
+            .filter(model.name.ilike(like_pattern(term), escape='\\'))
+        if genre:
+            query = query.filter(self.genre_filter(genre))
+        rows = query \
+            .order_by(self.db.func.similarity(model.name, term).desc(), model.name, model.id) \
+            .limit(self.limit) \
+            .all()
+        return {
+            "count": rows[0].total if rows else 0,
+            "data": [self._format(row) for row in rows]
+        }
+
+    def _search_ngram(self, term, genre=None):
+        index = self._get_index()
+        with self._lock:
+            ids, total = index.search(term, None if genre else self.limit)
+        if genre and ids:
+            members = {id for id, in self.db.session.query(self.model.id).filter(self.genre_filter(genre))}
+            ids = [id for id in ids if id in members]
+            ids, total = ids[:self.limit], len(ids)
+        if not ids:
+            return {"count": total, "data": []}
+
+        rows = self._query().filter(self.model.id.in_(ids)).all()
+        by_id = {row.id: row for row in rows}
+        return {
+            "count": total,
+            "data": [self._format(by_id[id]) for id in ids if id in by_id]
+        }
+
+    def _get_index(self):
+        with self._lock:
+            if self._index is None:
+                index = NGramIndex()
+                for id, name in self.db.session.query(self.model.id, self.model.name):
+                    index.add(id, name)
+                self._index = index
+            return self._index
+
+    def _pending(self, target):
+        # id -> new name, or None for a delete, held until the session commits
+        return object_session(target).info.setdefault(self, {})
+
+    def _on_save(self, mapper, connection, target):
+        self._pending(target)[target.id] = target.name
+
+    def _on_delete(self, mapper, connection, target):
+        self._pending(target)[target.id] = None
+
+    def _on_commit(self, session):
+        changes = session.info.pop(self, None)
+        if not changes:
+            return
+        with self._lock:
+            if self._index is None:
+                return
+            for id, name in changes.items():
+                if name is None:
+                    self._index.remove(id)
+                else:
+                    self._index.add(id, name)
+
+    def _on_rollback(self, session):
+        session.info.pop(self, None)
+
+    def reset(self):
+        # drop the in-process index; it is rebuilt on the next search
+        with self._lock:
+            self._index = None
+
@@ -0,0 +1,63 @@
+#----------------------------------------------------------------------------#
+# Template compilation cache and boot-time warm-up.
+#
+# Compiled templates are written to a filesystem bytecode cache shared by
+# every worker, so only the first process after a deploy pays for parsing
+# and compiling Jinja source. `flask compile-templates` fills that cache
+# ahead of time, and warm_up() loads every template and renders the main
+# pages once while a worker boots instead of on its first request.
+#----------------------------------------------------------------------------#
+
+import os
+
+import click
+from jinja2 import FileSystemBytecodeCache
+
+# pages rendered by warm_up(), in order
+WARM_UP_PATHS = ['/', '/venues', '/artists', '/shows']
+
+
+def configure_bytecode_cache(app):
+  # None picks jinja's private per-user directory, '' turns the cache off
+  directory = app.config.get('TEMPLATE_CACHE_DIR')
+  if directory == '':
+    return None
+  if directory:
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+  app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory or None, '%s.cache')
+  return app.jinja_env.bytecode_cache
+
+
+def compile_templates(app):
+  # loading a template compiles it and stores the bytecode in the cache
+  names = app.jinja_env.list_templates(extensions=['html'])
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
+
+
+def warm_up(app, paths=WARM_UP_PATHS):
+  compile_templates(app)
+  client = app.test_client()
+  for path in paths:
+    try:
+      response = client.get(path)
+      if response.status_code >= 500:
+        app.logger.warning('warm-up of %s returned %s', path, response.status_code)
+    except Exception:
+      # a missing database must not stop the worker from booting
+      app.logger.exception('warm-up of %s failed', path)
+
+
+def init_app(app):
+  configure_bytecode_cache(app)
+
+  @app.cli.command('compile-templates')
+  def compile_templates_command():
+    """Compile every template into the bytecode cache."""
+    names = compile_templates(app)
+    cache = app.jinja_env.bytecode_cache
+    click.echo('compiled %d templates into %s' % (len(names), cache.directory if cache else 'no cache'))
+
+  if app.config.get('WARM_UP_ON_BOOT'):
+    warm_up(app)
@@ -0,0 +1,473 @@
+import html
+import json
+import logging
+import os
+import queue
+import re
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from flask import Flask
+from sqlalchemy import event
+
+# the internal endpoints are off unless configured; config.py reads these
+os.environ.setdefault('DATABASE_POOL_METRICS_URL', '/internal/db-pool')
+os.environ.setdefault('METRICS_URL', '/internal/metrics')
+
+import instrumentation
+import logs
+import pool
+import templating
+from app import app, db, Venue, Artist, Show, Genre, artist_genres, migrate_genres, artist_search, book_show, create_show_indexes, show_counters
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the Fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app against an in-memory database."""
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        now = datetime.now()
+        jazz, rock = Genre(name='Jazz'), Genre(name='Rock n Roll')
+        self.venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=[jazz])
+        self.artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=[rock, jazz])
+        other = Artist(name='The Wild Sax Band', city='San Francisco', state='CA', genres=[jazz])
+        db.session.add_all([self.venue, self.artist, other])
+        db.session.flush()
+        db.session.add_all([
+            Show(venue_id=self.venue.id, artist_id=self.artist.id, start_time=now - timedelta(days=30)),
+            Show(venue_id=self.venue.id, artist_id=other.id, start_time=now + timedelta(days=1)),
+            Show(venue_id=self.venue.id, artist_id=other.id, start_time=now + timedelta(days=8)),
+        ])
+        db.session.commit()
+        self.venue_id = self.venue.id
+        self.artist_id = self.artist.id
+        db.session.remove()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        artist_search.reset()
+        self.ctx.pop()
+
+    def count_queries(self, fn):
+        queries = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            queries.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            result = fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        return result, queries
+
+    def test_show_venue_in_two_queries(self):
+        res, queries = self.count_queries(lambda: self.client().get('/venues/%d' % self.venue_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertLessEqual(len(queries), 2)
+        self.assertIn(b'2 Upcoming Shows', res.data)
+        self.assertIn(b'1 Past Show', res.data)
+        self.assertIn(b'The Wild Sax Band', res.data)
+
+    def test_show_artist_in_two_queries(self):
+        res, queries = self.count_queries(lambda: self.client().get('/artists/%d' % self.artist_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertLessEqual(len(queries), 2)
+        self.assertIn(b'0 Upcoming Shows', res.data)
+        self.assertIn(b'1 Past Show', res.data)
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertIn(b'Jazz', res.data)
+
+    def test_shows_keyset_pages(self):
+        res = self.client().get('/shows?limit=2')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data.count(b'tile-show'), 2)
+        self.assertIn(b'Next page', res.data)
+
+        next_url = re.search(rb'<li class="next"><a href="([^"]+)"', res.data).group(1)
+        res = self.client().get(html.unescape(next_url.decode()))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data.count(b'tile-show'), 1)
+        self.assertNotIn(b'Next page', res.data)
+
+    def test_artists_streamed_page(self):
+        res = self.client().get('/artists?stream=1&limit=1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.is_streamed)
+        self.assertIn(b'Guns N Petals', res.data)
+        self.assertNotIn(b'The Wild Sax Band', res.data)
+        self.assertIn(b'stream=1', res.data)
+
+    def test_artists_by_genre(self):
+        res = self.client().get('/artists?genre=Rock n Roll')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Guns N Petals', res.data)
+        self.assertNotIn(b'The Wild Sax Band', res.data)
+
+    def test_venues_by_genre(self):
+        res = self.client().get('/venues?genre=Jazz')
+        self.assertIn(b'The Musical Hop', res.data)
+
+        res = self.client().get('/venues?genre=Blues')
+        self.assertNotIn(b'The Musical Hop', res.data)
+
+    def test_search_artists_by_genre(self):
+        res = self.client().post('/artists/search', data={'search_term': 'a', 'genre': 'Rock n Roll'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Guns N Petals', res.data)
+        self.assertNotIn(b'The Wild Sax Band', res.data)
+
+    def test_search_index_follows_commits_only(self):
+        self.assertEqual(artist_search.search('Sax')['count'], 1)
+
+        db.session.add(Artist(name='Sax Appeal', city='San Francisco', state='CA'))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(artist_search.search('Sax')['count'], 1)
+
+        db.session.add(Artist(name='Sax Appeal', city='San Francisco', state='CA'))
+        db.session.commit()
+        self.assertEqual(artist_search.search('Sax')['count'], 2)
+
+    def test_migrate_genres(self):
+        db.session.execute(artist_genres.delete())
+        db.session.execute('ALTER TABLE "Artist" ADD COLUMN genres VARCHAR(120)')
+        db.session.execute('UPDATE "Artist" SET genres = :genres WHERE id = :id',
+                           {'genres': 'Jazz, Blues,,Jazz', 'id': self.artist_id})
+        db.session.commit()
+
+        self.assertEqual(migrate_genres(), 2)
+        self.assertEqual(migrate_genres(), 0)
+        artist = Artist.query.get(self.artist_id)
+        self.assertEqual([genre.name for genre in artist.genres], ['Blues', 'Jazz'])
+        self.assertEqual(Genre.query.filter_by(name='Jazz').count(), 1)
+
+    def book(self, start_time, venue_id=None, artist_id=None):
+        return self.client().post('/shows/create', data={
+            'venue_id': venue_id or self.venue_id,
+            'artist_id': artist_id or self.artist_id,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+    def test_create_show(self):
+        start_time = datetime.now().replace(microsecond=0) + timedelta(days=3)
+        res, queries = self.count_queries(lambda: self.book(start_time))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Show was successfully listed!', res.data)
+        self.assertEqual(Show.query.filter_by(artist_id=self.artist_id, start_time=start_time).count(), 1)
+        # at most watermark, venue lock, artist lock, overlap check, insert, watermark, two counters
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(Artist.query.get(self.artist_id).upcoming_shows_count, 1)
+
+    def test_409_venue_double_booked(self):
+        other = Artist.query.filter_by(name='The Wild Sax Band').one()
+        taken = Show.query.filter_by(artist_id=other.id).order_by(Show.start_time).first().start_time
+        res = self.book(taken + timedelta(hours=1))
+
+        self.assertEqual(res.status_code, 409)
+        self.assertIn(b'The venue already has a show', res.data)
+        self.assertEqual(Show.query.count(), 3)
+
+    def test_409_artist_double_booked(self):
+        other_venue = Venue(name='Park Square Live Music', city='San Francisco', state='CA')
+        db.session.add(other_venue)
+        db.session.commit()
+        taken = Show.query.filter_by(artist_id=self.artist_id).one().start_time
+        res = self.book(taken - timedelta(minutes=30), venue_id=other_venue.id)
+
+        self.assertEqual(res.status_code, 409)
+        self.assertIn(b'The artist already has a show', res.data)
+
+    def test_show_after_previous_one_ends(self):
+        taken = Show.query.filter_by(artist_id=self.artist_id).one().start_time
+        res = self.book(taken + timedelta(minutes=app.config['SHOW_DURATION_MINUTES'], seconds=1))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Show.query.count(), 4)
+
+    def test_400_show_missing_artist(self):
+        res = self.book(datetime.now() + timedelta(days=3), artist_id=9999)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(Show.query.count(), 3)
+
+    def test_create_show_indexes(self):
+        create_show_indexes()
+        indexes = {index['name'] for index in db.inspect(db.engine).get_indexes('Show')}
+
+        self.assertIn('ix_show_venue_id_start_time', indexes)
+        self.assertIn('ix_show_artist_id_start_time', indexes)
+
+    def counters(self, model, id):
+        record = model.query.get(id)
+        db.session.refresh(record)
+        return record.upcoming_shows_count, record.past_shows_count
+
+    def test_counters_follow_shows(self):
+        self.assertEqual(self.counters(Venue, self.venue_id), (2, 1))
+        self.assertEqual(self.counters(Artist, self.artist_id), (0, 1))
+
+        show = Show.query.filter_by(artist_id=self.artist_id).one()
+        show.start_time = datetime.now() + timedelta(days=2)
+        db.session.commit()
+        self.assertEqual(self.counters(Artist, self.artist_id), (1, 0))
+
+        db.session.delete(show)
+        db.session.commit()
+        self.assertEqual(self.counters(Venue, self.venue_id), (2, 0))
+        self.assertEqual(self.counters(Artist, self.artist_id), (0, 0))
+
+    def test_venues_listing_reads_counters(self):
+        res, queries = self.count_queries(lambda: self.client().get('/venues'))
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"Show"', queries[0])
+        self.assertIn(b'The Musical Hop', res.data)
+
+    def test_counters_rollover(self):
+        self.assertEqual(show_counters.rollover(datetime.now() + timedelta(days=2)), 1)
+        self.assertEqual(self.counters(Venue, self.venue_id), (1, 2))
+        self.assertEqual(show_counters.rollover(datetime.now()), 0)
+        self.assertEqual(show_counters.check(), [])
+
+    def test_booking_locks_watermark_before_rows(self):
+        _, queries = self.count_queries(
+            lambda: book_show(self.artist_id, self.venue_id, datetime.now() + timedelta(days=3)))
+        db.session.rollback()
+        tables = [next(t for t in ('show_counter_state', '"Venue"', '"Artist"') if t in q) for q in queries[:3]]
+
+        # the order the rollover takes them in, so the two cannot deadlock
+        self.assertEqual(tables, ['show_counter_state', '"Venue"', '"Artist"'])
+
+    def test_counters_check_reports_and_fixes_drift(self):
+        db.session.execute('UPDATE "Venue" SET upcoming_shows_count = 7')
+        db.session.commit()
+
+        drift = show_counters.check(fix=True)
+        self.assertEqual(drift, [{'model': 'Venue', 'id': self.venue_id, 'stored': (7, 1), 'actual': (2, 1)}])
+        self.assertEqual(self.counters(Venue, self.venue_id), (2, 1))
+        self.assertEqual(show_counters.check(), [])
+
+    def test_counters_migrate(self):
+        db.session.execute('ALTER TABLE "Venue" DROP COLUMN upcoming_shows_count')
+        db.session.execute('ALTER TABLE "Venue" DROP COLUMN past_shows_count')
+        db.session.commit()
+
+        show_counters.migrate()
+        self.assertEqual(self.counters(Venue, self.venue_id), (2, 1))
+
+    def test_400_bad_cursor(self):
+        res = self.client().get('/shows?after=garbage')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_404_show_missing_venue(self):
+        res = self.client().get('/venues/1000')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_pool_metrics(self):
+        self.client().get('/venues/{}'.format(self.venue_id))
+        res = self.client().get('/internal/db-pool')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertGreater(data['pool']['checkouts'], 0)
+        self.assertEqual(data['pool']['timeouts'], 0)
+
+    def test_404_pool_metrics_disabled_by_default(self):
+        other = Flask(__name__)
+        other.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DATABASE_POOL_METRICS_URL')
+            pool.PooledSQLAlchemy(other)
+        res = other.test_client().get('/internal/db-pool')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_request_metrics(self):
+        self.client().get('/venues/{}'.format(self.venue_id))
+        res = self.client().get('/internal/metrics')
+        body = res.get_data(as_text=True)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/venues/<int:venue_id>",status="200"}', body)
+        self.assertIn('http_request_db_queries_bucket{route="/venues/<int:venue_id>",le="2.0"}', body)
+        self.assertIn('template_render_seconds_count{template="pages/show_venue.html"}', body)
+        self.assertNotIn('route="/internal/metrics"', body)
+
+    def test_404_request_metrics_disabled_by_default(self):
+        other = Flask(__name__)
+        with mock.patch.dict(os.environ):
+            os.environ.pop('METRICS_URL')
+            instrumentation.init_app(other)
+        res = other.test_client().get('/internal/metrics')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_bytecode_cache_in_private_directory_by_default(self):
+        other = Flask(__name__)
+        cache = templating.configure_bytecode_cache(other)
+        info = os.stat(cache.directory)
+
+        self.assertEqual(info.st_uid, os.getuid())
+        self.assertEqual(info.st_mode & 0o777, 0o700)
+
+        other.config['TEMPLATE_CACHE_DIR'] = ''
+        self.assertIsNone(templating.configure_bytecode_cache(other))
+
+
+class BookingConcurrencyTestCase(unittest.TestCase):
+    """This class represents bookings racing counter rollovers"""
+
+    def setUp(self):
+        """Use a database file, or TEST_DATABASE_URL to take real row locks on postgres."""
+        self.directory = tempfile.TemporaryDirectory()
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+            'TEST_DATABASE_URL', 'sqlite:///' + os.path.join(self.directory.name, 'fyyur.db'))
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        self.venue_id = venue.id
+        self.artist_id = artist.id
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        artist_search.reset()
+        self.ctx.pop()
+        self.directory.cleanup()
+
+    def test_bookings_and_rollovers_do_not_deadlock(self):
+        start = datetime.now()
+        length = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+        errors = []
+
+        def book():
+            for i in range(20):
+                book_show(self.artist_id, self.venue_id, start + i * length + timedelta(seconds=1))
+                db.session.commit()
+
+        def roll():
+            for i in range(20):
+                show_counters.rollover(start + i * length)
+
+        def run(work):
+            with app.app_context():
+                try:
+                    work()
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=run, args=(work,)) for work in (book, roll)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(errors, [])
+        self.assertEqual(Show.query.count(), 20)
+        self.assertEqual(show_counters.check(), [])
+
+
+class LogsTestCase(unittest.TestCase):
+    """This class represents the queue-based logging test case"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'app.log')
+        self.app = Flask(__name__)
+        self.app.config.update(LOG_FILE=self.path, LOG_REQUESTS=True)
+
+        @self.app.route('/fail')
+        def fail():
+            self.app.logger.warning('failing on purpose')
+            raise ValueError('boom')
+
+    def tearDown(self):
+        logs.stop(self.app)
+        self.directory.cleanup()
+
+    def read_log(self):
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_json_lines_with_request_id_and_latency(self):
+        logs.init_app(self.app)
+        res = self.app.test_client().get('/fail', headers={'X-Request-ID': 'abc123'})
+        logs.stop(self.app)
+        entries = self.read_log()
+
+        self.assertEqual(res.status_code, 500)
+        self.assertEqual(res.headers['X-Request-ID'], 'abc123')
+        self.assertEqual([e['request_id'] for e in entries], ['abc123'] * len(entries))
+        self.assertEqual(entries[0]['message'], 'failing on purpose')
+        self.assertGreaterEqual(entries[0]['latency_ms'], 0)
+        self.assertTrue(any('ValueError: boom' in e.get('exception', '') for e in entries))
+        self.assertEqual(entries[-1]['status'], 500)
+
+    def test_drops_instead_of_blocking_when_full(self):
+        handler = logs.BoundedQueueHandler(queue.Queue(2), pressure=1.0)
+        record = logging.makeLogRecord({'msg': 'x', 'levelno': logging.ERROR})
+        for _ in range(5):
+            handler.emit(record)
+
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.take_lost(), (3, 0))
+        self.assertEqual(handler.take_lost(), (0, 0))
+
+    def test_samples_info_under_pressure(self):
+        handler = logs.BoundedQueueHandler(queue.Queue(10), pressure=0.5, sample_rate=0.0)
+        for _ in range(10):
+            handler.emit(logging.makeLogRecord({'msg': 'x', 'levelno': logging.INFO}))
+        handler.emit(logging.makeLogRecord({'msg': 'x', 'levelno': logging.ERROR}))
+
+        self.assertEqual(handler.queue.qsize(), 6)
+        self.assertEqual(handler.take_lost(), (0, 5))
+
+    def test_reopens_file_after_external_rotation(self):
+        self.app.config.update(LOG_BATCH_SIZE=1)
+        listener = logs.init_app(self.app)
+        self.app.logger.info('before rotation')
+        listener.queue.join()
+        os.rename(self.path, self.path + '.1')
+        self.app.logger.info('after rotation')
+        logs.stop(self.app)
+
+        self.assertEqual([e['message'] for e in self.read_log()], ['after rotation'])
+        with open(self.path + '.1', encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['message'] for line in f], ['before rotation'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+'''
+Benchmark for bulk_import.py.
+
+Writes a CSV and a JSON-lines file of generated questions, half of them
+naming their category and half giving its id, then imports each into an
+empty database and reports the time taken and questions per second.
+
+Run from the backend directory; set BENCH_DATABASE_URL to a scratch
+postgres database to time the COPY path instead of SQLite inserts:
+    python -m benchmarks.bench_bulk_import [questions] [chunk size]
+'''
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+from bulk_import import DEFAULT_CHUNK_SIZE, import_questions
+from models import setup_db, db, schema, reset_caches, Question, Category
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+
+def records(count):
+  for i in range(count):
+    category = CATEGORIES[i % len(CATEGORIES)] if i % 2 else str(i % len(CATEGORIES) + 1)
+    yield {
+      'question': 'Generated question number {}?'.format(i),
+      'answer': 'answer {}'.format(i),
+      'category': category,
+      'difficulty': i % 5 + 1
+    }
+
+
+def write_csv(path, count):
+  with open(path, 'w', newline='', encoding='utf-8') as f:
+    writer = csv.DictWriter(f, ['question', 'answer', 'category', 'difficulty'])
+    writer.writeheader()
+    writer.writerows(records(count))
+
+
+def write_jsonl(path, count):
+  with open(path, 'w', encoding='utf-8') as f:
+    for record in records(count):
+      f.write(json.dumps(record) + '\n')
+
+
+def run(database_url, path, chunk_size):
+  app = Flask(__name__)
+  setup_db(app, database_url)
+  with app.app_context():
+    db.drop_all()
+    db.engine.execute('DROP TABLE IF EXISTS schema_version')
+    reset_caches()
+    schema.migrate()
+    for name in CATEGORIES:
+      Category(name).insert()
+
+    start = time.perf_counter()
+    total = import_questions(path, chunk_size)
+    seconds = time.perf_counter() - start
+    assert Question.query.count() == total
+    db.session.remove()
+    db.engine.dispose()
+  return total, seconds
+
+
+def main(argv):
+  count = int(argv[1]) if len(argv) > 1 else 1000000
+  chunk_size = int(argv[2]) if len(argv) > 2 else DEFAULT_CHUNK_SIZE
+
+  with tempfile.TemporaryDirectory() as directory:
+    database_url = os.environ.get('BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(directory, 'bench.db'))
+    print('{} questions in chunks of {} on {}'.format(count, chunk_size, database_url.split(':')[0]))
+    for name, write in (('questions.csv', write_csv), ('questions.jsonl', write_jsonl)):
+      path = os.path.join(directory, name)
+      write(path, count)
+      total, seconds = run(database_url, path, chunk_size)
+      print('  {:<16} {:8.1f} s {:10.0f} questions/s'.format(name, seconds, total / seconds))
+
+
+if __name__ == '__main__':
+  main(sys.argv)
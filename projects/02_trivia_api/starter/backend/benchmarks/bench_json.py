@@ -0,0 +1,58 @@
+'''
+Benchmark for JSON response encoding.
+
+Encodes a response holding a list of question format() dicts, the shape
+of the question endpoints, with flask.jsonify and with fast_json.jsonify
+on every installed backend (pip install orjson to include it).
+
+Run from the backend directory:
+    python -m benchmarks.bench_json [items] [rounds]
+'''
+import sys
+import timeit
+
+import flask
+from flask import Flask
+
+import fast_json
+from models import Question
+
+
+def make_questions(count):
+  questions = []
+  for i in range(1, count + 1):
+    question = Question('What is the title of question number {}?'.format(i), 'Answer {}'.format(i), str(i % 6 + 1), i % 5 + 1)
+    question.id = i
+    questions.append(question.format())
+  return questions
+
+
+def run(app, jsonify, payload, rounds):
+  with app.app_context():
+    size = len(jsonify(payload).get_data())
+    seconds = timeit.timeit(lambda: jsonify(payload), number=rounds)
+  return seconds / rounds, size
+
+
+def main(count=10000, rounds=20):
+  payload = {
+    'success': True,
+    'questions': make_questions(count),
+    'total_questions': count,
+    'categories': {1: 'Science', 2: 'Art', 3: 'Geography', 4: 'History', 5: 'Entertainment', 6: 'Sports'},
+    'current_category': None
+  }
+
+  results = [('flask.jsonify', run(Flask(__name__), flask.jsonify, payload, rounds))]
+  for name in fast_json.BACKENDS:
+    app = Flask(__name__)
+    app.config['JSON_BACKEND'] = name
+    results.append(('fast_json ' + name, run(app, fast_json.jsonify, payload, rounds)))
+
+  print('%d questions x %d rounds' % (count, rounds))
+  for name, (seconds, size) in results:
+    print('%-18s %8.2f ms/response %8.1f MB/s %8d bytes' % (name, seconds * 1000, size / seconds / 1e6, size))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,98 @@
+'''
+Benchmark for the question search backends.
+
+Loads a synthetic corpus of questions and times a page of search results
+through each backend available for the database:
+  - ILIKE '%term%' scan, what a naive endpoint would run
+  - the in-memory inverted index (SQLite, tests)
+  - the tsvector column and GIN index (PostgreSQL only)
+
+Run from the backend directory; set BENCH_DATABASE_URL to a scratch
+postgres database to include the tsvector backend:
+    python -m benchmarks.bench_search [questions]
+'''
+import os
+import random
+import sys
+import time
+
+from flask import Flask
+
+from models import setup_db, db, Question
+from search import QuestionSearch
+
+DATABASE_URL = os.environ.get('BENCH_DATABASE_URL', 'sqlite://')
+TERMS = ['title', 'river', 'capital of', 'wh', 'first world']
+CHUNK = 50000
+PER_PAGE = 10
+
+
+def make_words(rng, count=5000):
+  letters = 'abcdefghijklmnopqrstuvwxyz'
+  words = {''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(count)}
+  return sorted(words) + ['title', 'river', 'capital', 'of', 'what', 'who', 'first', 'world']
+
+
+def seed(count, rng):
+  words = make_words(rng)
+  rows = []
+  for i in range(1, count + 1):
+    rows.append({
+      'question': ' '.join(rng.choice(words) for _ in range(rng.randint(6, 14))) + '?',
+      'answer': 'answer',
+      'category': str(rng.randint(1, 6)),
+      'difficulty': rng.randint(1, 5),
+    })
+    if len(rows) == CHUNK:
+      db.session.execute(Question.__table__.insert(), rows)
+      rows = []
+  if rows:
+    db.session.execute(Question.__table__.insert(), rows)
+  db.session.commit()
+
+
+def timed(fn, repeat=3):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best * 1000
+
+
+def ilike(term):
+  query = Question.query.filter(Question.question.ilike('%' + term + '%'))
+  return query.order_by(Question.id).limit(PER_PAGE).all(), query.count()
+
+
+def main(count=1000000):
+  app = Flask(__name__)
+  setup_db(app, DATABASE_URL)
+  ctx = app.app_context()
+  ctx.push()
+  db.drop_all()
+  db.create_all()
+  search = QuestionSearch(db, Question)
+  search.install()
+  seed(count, random.Random(0))
+
+  backends = [('ILIKE scan', ilike)]
+  if search.uses_tsvector():
+    db.session.execute('ANALYZE questions')
+    backends.append(('tsvector + GIN', lambda term: search.search(term, 1, PER_PAGE)))
+  else:
+    start = time.perf_counter()
+    search.search('', 1, PER_PAGE)
+    print('inverted index built in %.1f s' % (time.perf_counter() - start))
+    backends.append(('inverted index', lambda term: search.search(term, 1, PER_PAGE)))
+
+  print('%d questions on %s' % (count, db.engine.dialect.name))
+  print('%-16s' % 'term' + ''.join('%18s' % name for name, _ in backends))
+  for term in TERMS:
+    print('%-16s' % term + ''.join('%15.1f ms' % timed(lambda: fn(term)) for _, fn in backends))
+  ctx.pop()
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,69 @@
+'''
+Benchmark for app boot against an already migrated database.
+
+Times building the app and serving its first request, the way a worker
+cold start or a test setUp does:
+  - create_all() and the search index install on every boot, as setup_db
+    used to do
+  - the one-row schema version check setup_db does now
+
+Run from the backend directory; set BENCH_DATABASE_URL to a scratch
+postgres database for realistic catalog query costs:
+    python -m benchmarks.bench_startup [boots]
+'''
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+from sqlalchemy import event
+
+from models import setup_db, db, schema, question_search
+
+
+def boot(database_url, create_all):
+  app = Flask(__name__)
+  app.config['SCHEMA_CHECK'] = not create_all
+  setup_db(app, database_url)
+
+  @app.route('/ping')
+  def ping():
+    return jsonify({'success': True})
+
+  queries = [0]
+  with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda *args: queries.__setitem__(0, queries[0] + 1))
+    if create_all:
+      db.create_all()
+      question_search.install()
+  app.test_client().get('/ping')
+  return queries[0]
+
+
+def run(database_url, create_all, boots):
+  queries = 0
+  start = time.perf_counter()
+  for _ in range(boots):
+    queries += boot(database_url, create_all)
+  elapsed = time.perf_counter() - start
+  return elapsed / boots * 1000, queries / boots
+
+
+def main(boots=200):
+  with tempfile.TemporaryDirectory() as directory:
+    database_url = os.environ.get('BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(directory, 'bench.db'))
+    app = Flask(__name__)
+    setup_db(app, database_url)
+    with app.app_context():
+      schema.migrate()
+
+    print('%d boots on %s' % (boots, database_url.split(':')[0]))
+    for label, create_all in (('create_all per boot', True), ('schema version check', False)):
+      ms, queries = run(database_url, create_all, boots)
+      print('  %-22s %8.2f ms/boot %6.1f queries/boot' % (label, ms, queries))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:2]])
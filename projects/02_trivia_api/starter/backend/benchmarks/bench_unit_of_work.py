@@ -0,0 +1,80 @@
+'''
+Benchmark for request-scoped commits.
+
+Posts requests that each add a batch of questions through Question.insert(),
+once committing after every helper call and once with the unit of work,
+which commits each request once. Reports commits per request and latency.
+
+Run from the backend directory; set BENCH_DATABASE_URL to a scratch
+postgres database to include real fsync costs:
+    python -m benchmarks.bench_unit_of_work [requests] [questions per request]
+'''
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+from sqlalchemy import event
+
+from models import setup_db, db, Question
+
+
+def build_app(database_url, unit_of_work, per_request):
+  app = Flask(__name__)
+  app.config['UNIT_OF_WORK'] = unit_of_work
+  # the tables are recreated below rather than migrated
+  app.config['SCHEMA_CHECK'] = False
+  setup_db(app, database_url)
+
+  @app.route('/batch', methods=['POST'])
+  def batch():
+    for i in range(per_request):
+      Question('question {}'.format(i), 'answer', '1', 1).insert()
+    return jsonify({'success': True})
+
+  return app
+
+
+def run(database_url, unit_of_work, requests, per_request):
+  app = build_app(database_url, unit_of_work, per_request)
+  commits = [0]
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+    event.listen(db.engine, 'commit', lambda connection: commits.__setitem__(0, commits[0] + 1))
+
+  client = app.test_client()
+  latencies = []
+  for _ in range(requests):
+    start = time.perf_counter()
+    client.post('/batch')
+    latencies.append(time.perf_counter() - start)
+
+  with app.app_context():
+    inserted = Question.query.count()
+  latencies.sort()
+  return {
+    'commits': commits[0] / requests,
+    'p50': latencies[len(latencies) // 2] * 1000,
+    'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+    'inserted': inserted,
+  }
+
+
+def main(argv):
+  requests = int(argv[1]) if len(argv) > 1 else 200
+  per_request = int(argv[2]) if len(argv) > 2 else 20
+
+  with tempfile.TemporaryDirectory() as directory:
+    # a file database, so every commit pays for a real write
+    database_url = os.environ.get('BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(directory, 'bench.db'))
+    print('{} requests x {} inserts on {}'.format(requests, per_request, database_url.split(':')[0]))
+    for label, unit_of_work in (('commit per helper', False), ('unit of work', True)):
+      result = run(database_url, unit_of_work, requests, per_request)
+      print('  {:<18} {:6.1f} commits/request  p50 {:7.2f} ms  p99 {:7.2f} ms  ({} rows)'.format(
+        label, result['commits'], result['p50'], result['p99'], result['inserted']))
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -0,0 +1,54 @@
+'''
+Load test for the quiz question sampler.
+
+Simulates thousands of concurrent quiz sessions, each drawing questions
+until its quiz is over, for growing category sizes. Draw time should stay
+flat as the category grows, and no session may see a question twice.
+
+Run from the backend directory:
+    python -m benchmarks.load_quiz_sessions [sessions] [questions_per_quiz]
+'''
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from quiz import QuestionSampler
+
+CATEGORIES = 6
+
+
+def play(sampler, category, questions_per_quiz):
+  previous = set()
+  for _ in range(questions_per_quiz):
+    id = sampler.sample(category, previous)
+    if id is None:
+      break
+    if id in previous:
+      raise AssertionError('question %d drawn twice' % id)
+    previous.add(id)
+  return len(previous)
+
+
+def run(size, sessions, questions_per_quiz, workers=32):
+  sampler = QuestionSampler(lambda: ((id, id % CATEGORIES + 1) for id in range(size)))
+  sampler.sample()  # load the ids outside the timed section
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    draws = sum(pool.map(
+      lambda session: play(sampler, session % (CATEGORIES + 1) or None, questions_per_quiz),
+      range(sessions)
+    ))
+  elapsed = time.perf_counter() - start
+  return draws, elapsed
+
+
+def main(sessions=5000, questions_per_quiz=5):
+  print('%12s %10s %10s %14s' % ('questions', 'sessions', 'draws', 'us per draw'))
+  for size in (1000, 100000, 1000000):
+    draws, elapsed = run(size, sessions, questions_per_quiz)
+    print('%12d %10d %10d %14.2f' % (size, sessions, draws, elapsed / draws * 1e6))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,189 @@
+'''
+bulk_import.py
+  streams questions from a CSV or JSON-lines file into the questions table
+
+  each record has question, answer, category and difficulty fields, where
+  category is either a category id or a category name such as "Science";
+  unknown names are added to the categories table, and a record without
+  one is imported without a category
+
+  rows are written in chunks, one transaction per chunk: with COPY on
+  PostgreSQL and with a single executemany INSERT elsewhere
+
+  the rows bypass the models, so running servers only draw them in quizzes
+  once their quiz index is reloaded (QUIZ_SAMPLER_MAX_AGE); on SQLite, where
+  search uses an in-memory index, restart the server after an import
+
+  usage, from the backend directory:
+    python bulk_import.py questions.csv
+    python bulk_import.py questions.jsonl --chunk-size 50000 --database-url sqlite:///trivia.db
+'''
+import argparse
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+
+from flask import Flask
+
+from models import setup_db, db, database_path, Question, Category, category_map
+
+DEFAULT_CHUNK_SIZE = 10000
+COLUMNS = ('question', 'answer', 'category', 'difficulty')
+
+
+class RecordError(Exception):
+  def __init__(self, line, message):
+    super().__init__('line {}: {}'.format(line, message))
+    self.line = line
+
+
+'''
+read_records(path)
+  yields (line number, record dict) pairs; .jsonl/.ndjson files are read as
+  JSON lines, everything else as CSV with a header row
+'''
+def read_records(path):
+  with open(path, newline='', encoding='utf-8') as f:
+    if path.endswith(('.jsonl', '.ndjson')):
+      for line, text in enumerate(f, 1):
+        if text.strip():
+          try:
+            record = json.loads(text)
+          except ValueError as e:
+            raise RecordError(line, 'invalid JSON ({})'.format(e))
+          if not isinstance(record, dict):
+            raise RecordError(line, 'expected a JSON object')
+          yield line, record
+    else:
+      reader = csv.DictReader(f)
+      for record in reader:
+        yield reader.line_num, record
+
+
+'''
+CategoryResolver
+  maps a category id or name to a category id, reading the categories table
+  once through the cached category_map(); None or a blank name maps to None
+  and any other value raises ValueError
+'''
+class CategoryResolver:
+  def __init__(self):
+    categories = category_map()
+    self.ids = set(categories)
+    self.by_name = {type.lower(): id for id, type in categories.items()}
+
+  def resolve(self, value):
+    if value is None:
+      return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+      raise ValueError('category must be an id or a name')
+    if isinstance(value, int) or value.strip().isdigit():
+      id = int(value)
+      if id in self.ids:
+        return id
+    name = str(value).strip()
+    if not name:
+      return None
+    id = self.by_name.get(name.lower())
+    if id is None:
+      category = Category(name)
+      category.insert()
+      id = category.id
+      self.ids.add(id)
+      self.by_name[name.lower()] = id
+    return id
+
+
+def to_row(line, record, categories):
+  question = record.get('question') or ''
+  answer = record.get('answer') or ''
+  if not isinstance(question, str) or not isinstance(answer, str):
+    raise RecordError(line, 'question and answer must be text')
+  question, answer = question.strip(), answer.strip()
+  if not question or not answer:
+    raise RecordError(line, 'question and answer are required')
+  try:
+    difficulty = int(record.get('difficulty') or 1)
+  except (TypeError, ValueError):
+    raise RecordError(line, 'difficulty must be a number')
+  try:
+    category = categories.resolve(record.get('category'))
+  except ValueError as e:
+    raise RecordError(line, str(e))
+  return {
+    'question': question,
+    'answer': answer,
+    'category': None if category is None else str(category),
+    'difficulty': difficulty
+  }
+
+
+def insert_chunk(rows):
+  with db.engine.begin() as connection:
+    connection.execute(Question.__table__.insert(), rows)
+
+
+def copy_chunk(rows):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in rows:
+    writer.writerow([row[column] for column in COLUMNS])
+  buffer.seek(0)
+
+  connection = db.engine.raw_connection()
+  try:
+    cursor = connection.cursor()
+    cursor.copy_expert(
+      'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(Question.__tablename__, ', '.join(COLUMNS)),
+      buffer
+    )
+    connection.commit()
+  finally:
+    connection.close()
+
+
+'''
+import_questions(path, chunk_size)
+  loads every record of `path` and returns the number of questions added
+  chunks already written stay committed if a later record is invalid
+'''
+def import_questions(path, chunk_size=DEFAULT_CHUNK_SIZE):
+  write = copy_chunk if db.engine.dialect.name == 'postgresql' else insert_chunk
+  categories = CategoryResolver()
+  records = read_records(path)
+  total = 0
+  while True:
+    rows = [to_row(line, record, categories) for line, record in itertools.islice(records, chunk_size)]
+    if not rows:
+      break
+    write(rows)
+    total += len(rows)
+  return total
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Bulk import trivia questions.')
+  parser.add_argument('path', help='CSV file with a header row, or a .jsonl file')
+  parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                      help='questions per transaction (default %(default)s)')
+  parser.add_argument('--database-url', default=database_path)
+  args = parser.parse_args(argv)
+
+  app = Flask(__name__)
+  setup_db(app, args.database_url)
+  with app.app_context():
+    start = time.perf_counter()
+    try:
+      total = import_questions(args.path, args.chunk_size)
+    except RecordError as e:
+      print('import failed: {}'.format(e), file=sys.stderr)
+      return 1
+    print('imported {} questions in {:.1f}s'.format(total, time.perf_counter() - start))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
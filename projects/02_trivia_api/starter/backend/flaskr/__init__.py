@@ -1,17 +1,41 @@
 import os
-from flask import Flask, request, abort, jsonify
+from flask import Flask, request, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import random
 
-from models import setup_db, Question, Category
+import fast_json
+import instrumentation
+from fast_json import jsonify
+from models import setup_db, database_path, Question, Category, category_map, count_questions, question_sampler, question_search, response_cache
 
 QUESTIONS_PER_PAGE = 10
 
+'''
+paginate_questions(request)
+  returns one page of questions, fetched with LIMIT/OFFSET for ?page=<n>
+  or, when ?after=<question id> is given, with a keyset on the id so deep
+  pages do not have to skip over every earlier row
+'''
+def paginate_questions(request, query=None):
+  query = (Question.query if query is None else query).order_by(Question.id)
+  after = request.args.get('after', None, type=int)
+  if after is not None:
+    query = query.filter(Question.id > after)
+  else:
+    page = request.args.get('page', 1, type=int)
+    query = query.offset((max(page, 1) - 1) * QUESTIONS_PER_PAGE)
+  questions = query.limit(QUESTIONS_PER_PAGE).all()
+  return [question.format() for question in questions]
+
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
-  setup_db(app)
+  if test_config is not None:
+    app.config.from_mapping(test_config)
+  setup_db(app, app.config.get('SQLALCHEMY_DATABASE_URI', database_path))
+  fast_json.init_app(app)
+  instrumentation.init_app(app)
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -26,6 +50,13 @@ def create_app(test_config=None):
   Create an endpoint to handle GET requests 
   for all available categories.
   '''
+  @app.route('/categories')
+  @response_cache.cached('categories')
+  def get_categories():
+    return jsonify({
+      'success': True,
+      'categories': category_map()
+    })
 
 
   '''
@@ -40,6 +71,20 @@ def create_app(test_config=None):
   ten questions per page and pagination at the bottom of the screen for three pages.
   Clicking on the page numbers should update the questions. 
   '''
+  @app.route('/questions')
+  def get_questions():
+    questions = paginate_questions(request)
+    if not questions and request.args.get('page', 1, type=int) > 1:
+      abort(404)
+
+    return jsonify({
+      'success': True,
+      'questions': questions,
+      # APPROXIMATE_TOTALS trades an exact count(*) for the planner estimate
+      'total_questions': count_questions(app.config.get('APPROXIMATE_TOTALS', False)),
+      'categories': category_map(),
+      'current_category': None
+    })
 
   '''
   @TODO: 
@@ -70,6 +115,22 @@ def create_app(test_config=None):
   only question that include that string within their question. 
   Try using the word "title" to start. 
   '''
+  @app.route('/questions/search', methods=['POST'])
+  def search_questions():
+    body = request.get_json(silent=True) or {}
+    search_term = body.get('searchTerm', '')
+    page = body.get('page', request.args.get('page', 1, type=int))
+    if not isinstance(search_term, str) or not isinstance(page, int):
+      abort(422)
+
+    # ranked full-text search: tsvector + GIN on postgres, in-memory index elsewhere
+    questions, total = question_search.search(search_term, page, QUESTIONS_PER_PAGE)
+    return jsonify({
+      'success': True,
+      'questions': [question.format() for question in questions],
+      'total_questions': total,
+      'current_category': None
+    })
 
   '''
   @TODO: 
@@ -92,6 +153,38 @@ def create_app(test_config=None):
   one question at a time is displayed, the user is allowed to answer
   and shown whether they were correct or not. 
   '''
+  @app.route('/quizzes', methods=['POST'])
+  def play_quiz():
+    body = request.get_json(silent=True) or {}
+    previous_questions = body.get('previous_questions', [])
+    quiz_category = body.get('quiz_category') or {}
+    if not isinstance(previous_questions, list) or not isinstance(quiz_category, dict):
+      abort(422)
+    if not all(type(id) is int for id in previous_questions):
+      abort(422)
+
+    # category id 0 is "All"
+    category = quiz_category.get('id') or None
+    previous_questions = set(previous_questions)
+    # drawn from the in-memory id arrays; only the chosen row is read
+    question = None
+    while question is None:
+      question_id = question_sampler.sample(category, previous_questions)
+      if question_id is None:
+        break
+      question = Question.query.get(question_id)
+      if question is None:
+        # deleted by another process, e.g. another worker or a script
+        question_sampler.remove(question_id)
+      elif category is not None and question.category != str(category):
+        # moved to another category by another process
+        question_sampler.add(question.id, question.category)
+        question = None
+
+    return jsonify({
+      'success': True,
+      'question': question.format() if question else None
+    })
 
   '''
   @TODO: 
@@ -1,23 +1,52 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, String, Integer, MetaData, Table, create_engine
 import json
+import time
+from functools import partial
+
+from quiz import QuestionSampler
+from search import QuestionSearch
+from pool import PooledSQLAlchemy
+from response_cache import ResponseCache
+from schema import Schema
+from unit_of_work import UnitOfWork
 
 database_name = "trivia"
 database_path = "postgres://{}/{}".format('localhost:5432', database_name)
 
-db = SQLAlchemy()
+# below this many rows an exact count is cheap enough to always use
+APPROXIMATE_COUNT_THRESHOLD = 100000
+
+db = PooledSQLAlchemy()
+
+'''
+unit_of_work
+    batches the insert/update/delete helpers into one commit per request
+'''
+unit_of_work = UnitOfWork(db)
+
+'''
+response_cache
+    cached GET responses, invalidated by the model write hooks below
+'''
+response_cache = ResponseCache()
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    pool settings are read from the DATABASE_POOL_* config, see pool.py
+    tables are not created here; run `flask migrate`, see schema.py
 '''
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.app = app
     db.init_app(app)
-    db.create_all()
+    if app.config.get('UNIT_OF_WORK', True):
+        unit_of_work.init_app(app)
+    schema.init_app(app)
+    response_cache.init_app(app)
+    question_sampler.init_app(app)
 
 '''
 Question
@@ -40,14 +69,18 @@ class Question(db.Model):
 
   def insert(self):
     db.session.add(self)
-    db.session.commit()
+    unit_of_work.commit(flush=True)
+    unit_of_work.on_commit(partial(index_question, self.id, self.category, self.question))
   
   def update(self):
-    db.session.commit()
+    unit_of_work.commit(flush=True)
+    unit_of_work.on_commit(partial(index_question, self.id, self.category, self.question))
 
   def delete(self):
+    id = self.id
     db.session.delete(self)
-    db.session.commit()
+    unit_of_work.commit(flush=True)
+    unit_of_work.on_commit(partial(unindex_question, id))
 
   def format(self):
     return {
@@ -58,6 +91,63 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+'''
+question_sampler
+    in-memory per-category question ids used to draw quiz questions
+    loaded on first use and kept current by Question.insert/update/delete
+    reloaded every QUIZ_SAMPLER_MAX_AGE seconds (default 300) to pick up
+    writes made by other processes
+'''
+question_sampler = QuestionSampler(
+  lambda: db.session.query(Question.id, Question.category).all()
+)
+
+'''
+question_search
+    full-text search over question text, see search.py
+'''
+question_search = QuestionSearch(db, Question)
+
+def index_question(id, category, question):
+  question_sampler.add(id, category)
+  question_search.add(id, question)
+  response_cache.bump('questions')
+
+def unindex_question(id):
+  question_sampler.remove(id)
+  question_search.remove(id)
+  response_cache.bump('questions')
+
+'''
+create_tables(connection)
+    migration 1, the tables as first released. frozen: it does not follow
+    the models, so changing one needs a new migration
+'''
+def create_tables(connection):
+  metadata = MetaData()
+  Table('questions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('question', String),
+    Column('answer', String),
+    Column('category', String),
+    Column('difficulty', Integer))
+  Table('categories', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('type', String))
+  metadata.create_all(bind=connection)
+
+def install_search(connection):
+  # the configuration migration 2 was released with; see simple_search
+  question_search.install(connection, 'pg_catalog.english')
+
+'''
+simple_search(connection)
+    migration 3, searches with the 'simple' configuration, which keeps stop
+    words and does not stem, as the in-memory index used on SQLite does
+'''
+def simple_search(connection):
+  question_search.reconfigure(connection, 'pg_catalog.simple')
+
 '''
 Category
 
@@ -71,8 +161,82 @@ class Category(db.Model):
   def __init__(self, type):
     self.type = type
 
+  def insert(self):
+    db.session.add(self)
+    unit_of_work.commit(flush=True)
+    unit_of_work.on_commit(categories_changed)
+
+  def update(self):
+    unit_of_work.commit(flush=True)
+    unit_of_work.on_commit(categories_changed)
+
+  def delete(self):
+    db.session.delete(self)
+    unit_of_work.commit(flush=True)
+    unit_of_work.on_commit(categories_changed)
+
   def format(self):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+category_map()
+    returns a cached {id: type} dictionary of all categories
+    the cache is dropped once a Category insert, update or delete made
+    through the model helpers is committed, never for a rolled back one
+    it also expires after response_cache.max_age seconds, so writes from
+    other processes or bulk_import.py show up within the same bound as in
+    cached responses
+'''
+_category_map = None  # (loaded at, {id: type})
+
+def category_map():
+  global _category_map
+  cached = _category_map
+  now = time.monotonic()
+  if cached is None or now >= cached[0] + response_cache.max_age:
+    categories = {category.id: category.type for category in Category.query.order_by(Category.id)}
+    _category_map = cached = (now, categories)
+  return cached[1]
+
+def categories_changed():
+  global _category_map
+  _category_map = None
+  response_cache.bump('categories')
+
+'''
+count_questions(approximate=False)
+    returns the number of rows in the questions table
+    with approximate=True on postgres, large tables are estimated from the
+    planner statistics in pg_class.reltuples instead of a full count(*)
+'''
+def count_questions(approximate=False):
+  if approximate and db.engine.dialect.name == 'postgresql':
+    estimate = db.session.execute(
+      "SELECT reltuples::bigint FROM pg_class WHERE oid = 'questions'::regclass"
+    ).scalar()
+    if estimate is not None and estimate >= APPROXIMATE_COUNT_THRESHOLD:
+      return int(estimate)
+  return Question.query.count()
+
+'''
+reset_caches()
+    drops every in-memory cache built from the database; each is reloaded
+    on next use. needed after rows change behind the models' back, e.g. a
+    rolled back test transaction
+'''
+def reset_caches():
+  global _category_map
+  _category_map = None
+  question_sampler.reset()
+  question_search.reset()
+  response_cache.clear()
+
+'''
+schema
+    the migrations run by `flask migrate`, oldest first
+    append new ones to the end; never change one that has been applied
+'''
+schema = Schema(db, [create_tables, install_search, simple_search])
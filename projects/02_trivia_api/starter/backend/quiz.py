@@ -0,0 +1,153 @@
+import os
+import random
+import threading
+import time
+
+ALL_CATEGORIES = None
+
+'''
+QuestionSampler
+  keeps the question ids of every category in memory so a quiz question can
+  be drawn without querying or scanning the questions table
+
+  ids live in one array per category (plus one for all questions), and each
+  id remembers its slot so it can be removed by swapping in the last id
+
+  the arrays are per process: add() and remove() only reach the process
+  that made the write. they are therefore reloaded once they are max_age
+  seconds old, which bounds how long a question written by another worker
+  or by bulk_import.py stays out of, or in, this process's draws. the
+  reload reads every id; one draw pays for it while draws in other threads
+  keep using the old arrays
+'''
+class QuestionSampler:
+  def __init__(self, loader, rng=None, max_age=300):
+    # loader() returns (id, category) pairs for every question
+    self._loader = loader
+    self._rng = rng or random.Random()
+    self.max_age = max_age
+    self._lock = threading.Lock()
+    self._reload_lock = threading.Lock()
+    self._ids = None
+    self._slots = None
+    self._categories = None
+    self._loaded_at = None
+
+  '''
+  init_app(app)
+    QUIZ_SAMPLER_MAX_AGE, read from the app config or the environment,
+    overrides max_age
+  '''
+  def init_app(self, app):
+    max_age = app.config.get('QUIZ_SAMPLER_MAX_AGE', os.environ.get('QUIZ_SAMPLER_MAX_AGE'))
+    if max_age is not None:
+      self.max_age = float(max_age)
+
+  def _stale(self):
+    return self._ids is None or time.monotonic() >= self._loaded_at + self.max_age
+
+  def _ensure_loaded(self):
+    if not self._stale():
+      return
+    # only the first load makes callers wait; a reload already under way
+    # elsewhere leaves this caller with the current arrays
+    if not self._reload_lock.acquire(blocking=self._ids is None):
+      return
+    try:
+      if self._stale():
+        loaded_at = time.monotonic()
+        loaded = QuestionSampler(self._loader)
+        loaded._load()
+        with self._lock:
+          self._ids, self._slots, self._categories = loaded._ids, loaded._slots, loaded._categories
+          self._loaded_at = loaded_at
+    finally:
+      self._reload_lock.release()
+
+  def _load(self):
+    self._ids = {ALL_CATEGORIES: []}
+    self._slots = {ALL_CATEGORIES: {}}
+    self._categories = {}
+    for id, category in self._loader():
+      self._add(id, category)
+
+  def _append(self, key, id):
+    ids = self._ids.setdefault(key, [])
+    self._slots.setdefault(key, {})[id] = len(ids)
+    ids.append(id)
+
+  def _pop(self, key, id):
+    ids, slots = self._ids[key], self._slots[key]
+    slot = slots.pop(id)
+    last = ids.pop()
+    if last != id:
+      ids[slot] = last
+      slots[last] = slot
+
+  def _add(self, id, category):
+    if id in self._categories:
+      self._remove(id)
+    category = str(category)
+    self._categories[id] = category
+    self._append(ALL_CATEGORIES, id)
+    self._append(category, id)
+
+  def _remove(self, id):
+    category = self._categories.pop(id, None)
+    if category is None:
+      return
+    self._pop(ALL_CATEGORIES, id)
+    self._pop(category, id)
+
+  '''
+  add(id, category)
+    files a new question, or moves an existing one to a new category
+  '''
+  def add(self, id, category):
+    with self._lock:
+      if self._ids is not None:
+        self._add(id, category)
+
+  def remove(self, id):
+    with self._lock:
+      if self._ids is not None:
+        self._remove(id)
+
+  def reset(self):
+    with self._lock:
+      self._ids = self._slots = self._categories = None
+
+  '''
+  sample(category, exclude)
+    returns a random question id in `category` (None for all categories)
+    that is not in `exclude`, or None when every question has been used
+
+    draws are rejected and retried while they hit `exclude`, which takes a
+    couple of tries when exclude is small next to the category. once
+    exclude covers half of the category the remaining ids are listed
+    instead, which costs at most twice the size of exclude
+  '''
+  def sample(self, category=ALL_CATEGORIES, exclude=()):
+    exclude = exclude if isinstance(exclude, (set, frozenset)) else set(exclude)
+    key = ALL_CATEGORIES if category is None else str(category)
+    while True:
+      self._ensure_loaded()
+      with self._lock:
+        # unless reset() emptied the arrays since they were loaded
+        if self._ids is not None:
+          return self._draw(key, exclude)
+
+  def _draw(self, key, exclude):
+    # callers must hold _lock
+    ids = self._ids.get(key)
+    if not ids:
+      return None
+
+    if len(exclude) * 2 < len(ids):
+      while True:
+        id = ids[self._rng.randrange(len(ids))]
+        if id not in exclude:
+          return id
+
+    remaining = [id for id in ids if id not in exclude]
+    return self._rng.choice(remaining) if remaining else None
@@ -0,0 +1,143 @@
+# Shared helper, copied into every project that uses it so each one stays
+# standalone. Copies differ only in indent width, which follows each project;
+# change them together. test_shared_helpers.py at the repo root checks this.
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Column, Integer, MetaData, Table, select, text
+
+# key of the postgres advisory lock migrate() holds, see _lock()
+MIGRATE_LOCK_KEY = 0x736368656d61
+
+'''
+SchemaError
+  raised when the database is older than the code; run `flask migrate`
+'''
+class SchemaError(RuntimeError):
+  pass
+
+
+'''
+Schema
+  the database schema as an ordered list of migrations, each a function
+  taking a connection; version n means the first n have been applied
+
+  the applied version is kept in the one-row schema_version table, so
+  checking it at boot is a single read instead of the per-table catalog
+  queries create_all() runs. DDL only ever runs from migrate()
+'''
+class Schema:
+  def __init__(self, db, migrations):
+    self.db = db
+    self.migrations = migrations
+    self.metadata = MetaData()
+    self.table = Table('schema_version', self.metadata, Column('version', Integer, nullable=False))
+
+  @property
+  def latest(self):
+    return len(self.migrations)
+
+  '''
+  init_app(app)
+    registers `flask migrate` and, unless SCHEMA_CHECK is False, checks the
+    schema version once before the first request the app serves
+  '''
+  def init_app(self, app):
+    app.extensions.setdefault('schema', {'checked': False})
+    if 'migrate' not in app.cli.commands:
+      app.cli.add_command(self.migrate_command)
+      app.before_request(self._check_once)
+
+  def _check_once(self):
+    state = current_app.extensions['schema']
+    if state['checked'] or not current_app.config.get('SCHEMA_CHECK', True):
+      return
+    self.check()
+    state['checked'] = True
+
+  '''
+  current_version()
+    the applied version, 0 for a database without a schema_version table
+    any other database error, e.g. a refused connection, is raised
+  '''
+  def current_version(self):
+    with self.db.engine.connect() as connection:
+      # the one catalog lookup inspector.has_table() makes
+      if not connection.dialect.has_table(connection, self.table.name):
+        return 0
+      version = connection.execute(select([self.table.c.version])).scalar()
+    return version or 0
+
+  '''
+  check()
+    returns the schema version, raising SchemaError if migrations are pending
+    a newer schema is accepted so old workers keep running during a deploy
+  '''
+  def check(self):
+    version = self.current_version()
+    if version < self.latest:
+      raise SchemaError(
+        'database schema is at version {}, this code needs version {}; run `flask migrate`'
+        .format(version, self.latest)
+      )
+    return version
+
+  '''
+  migrate()
+    applies the pending migrations in order, one transaction each, and
+    returns the list of versions applied
+
+    each transaction starts with _lock(), so concurrent runs, e.g. two
+    instances released at once, take turns: the first creates the
+    schema_version table and applies a step, the others then find them done
+  '''
+  def migrate(self):
+    engine = self.db.engine
+    if self.current_version() >= self.latest:
+      return []
+
+    with engine.begin() as connection:
+      self._lock(connection)
+      self.metadata.create_all(connection)
+      if connection.execute(select([self.table.c.version])).scalar() is None:
+        connection.execute(self.table.insert(), version=0)
+
+    applied = []
+    for version, migration in enumerate(self.migrations, 1):
+      with engine.begin() as connection:
+        self._lock(connection)
+        current = connection.execute(
+          select([self.table.c.version]).with_for_update()
+        ).scalar()
+        if current >= version:
+          continue
+        migration(connection)
+        connection.execute(self.table.update(), version=version)
+      applied.append(version)
+    return applied
+
+  '''
+  _lock(connection)
+    held until the transaction ends: an advisory lock on postgres, the
+    write lock on sqlite, whose reads would otherwise run before it takes
+    one; elsewhere the FOR UPDATE on the version row is the only lock
+  '''
+  def _lock(self, connection):
+    if connection.dialect.name == 'postgresql':
+      connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), key=MIGRATE_LOCK_KEY)
+    elif connection.dialect.name == 'sqlite' and not connection.connection.in_transaction:
+      # pysqlite defers BEGIN to the first write unless it was sent already
+      connection.execute(text('BEGIN IMMEDIATE'))
+
+  @property
+  def migrate_command(self):
+    @click.command('migrate')
+    @with_appcontext
+    def migrate():
+      '''Apply pending database schema migrations.'''
+      applied = self.migrate()
+      if applied:
+        click.echo('migrated to schema version {}'.format(applied[-1]))
+      else:
+        click.echo('schema is up to date (version {})'.format(self.latest))
+    return migrate
@@ -0,0 +1,214 @@
+import bisect
+import re
+import threading
+
+from sqlalchemy import text, literal_column
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+# text search configuration of the tsvector column and of every query.
+# 'simple' only lowercases: it keeps stop words and does not stem, so a
+# term matches the same questions as it does in InvertedIndex
+SEARCH_CONFIG = 'pg_catalog.simple'
+
+'''
+tokenize(text)
+  lowercased words of a question, the unit both search backends match on
+'''
+def tokenize(value):
+  return WORD.findall((value or '').lower())
+
+
+'''
+InvertedIndex
+  in-memory word -> {question id: occurrences} index, used on SQLite and in
+  unit tests where there is no tsvector support
+
+  every search word matches as a prefix ("tit" finds "title"), all words
+  must match, and results are ranked by how often the words occur
+'''
+class InvertedIndex:
+  def __init__(self):
+    self._postings = {}
+    self._documents = {}
+    self._vocabulary = None
+
+  def __len__(self):
+    return len(self._documents)
+
+  def add(self, id, value):
+    self.remove(id)
+    tokens = tokenize(value)
+    self._documents[id] = tokens
+    for token in tokens:
+      postings = self._postings.get(token)
+      if postings is None:
+        postings = self._postings[token] = {}
+        self._vocabulary = None
+      postings[id] = postings.get(id, 0) + 1
+
+  def remove(self, id):
+    tokens = self._documents.pop(id, None)
+    if tokens is None:
+      return
+    for token in set(tokens):
+      postings = self._postings[token]
+      del postings[id]
+      if not postings:
+        del self._postings[token]
+        self._vocabulary = None
+
+  def _matches(self, prefix):
+    # sorted vocabulary, rebuilt only after words were added or removed
+    if self._vocabulary is None:
+      self._vocabulary = sorted(self._postings)
+    vocabulary = self._vocabulary
+    scores = {}
+    i = bisect.bisect_left(vocabulary, prefix)
+    while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+      for id, count in self._postings[vocabulary[i]].items():
+        scores[id] = scores.get(id, 0) + count
+      i += 1
+    return scores
+
+  '''
+  search(term)
+    returns the ids of every matching question, best match first
+  '''
+  def search(self, term):
+    tokens = tokenize(term)
+    if not tokens:
+      return sorted(self._documents)
+
+    scores = None
+    for token in sorted(set(tokens), key=len, reverse=True):
+      matches = self._matches(token)
+      if scores is None:
+        scores = matches
+      else:
+        scores = {id: score + matches[id] for id, score in scores.items() if id in matches}
+      if not scores:
+        return []
+    return sorted(scores, key=lambda id: (-scores[id], id))
+
+
+'''
+QuestionSearch
+  full-text search over Question.question
+
+  on PostgreSQL questions carry a tsvector column, kept current by a
+  trigger and served by a GIN index (see install()); everywhere else an
+  InvertedIndex is built on first use and kept current by
+  Question.insert/update/delete
+'''
+class QuestionSearch:
+  def __init__(self, db, model):
+    self.db = db
+    self.model = model
+    self._index = None
+    self._lock = threading.Lock()
+
+  def uses_tsvector(self):
+    return self.db.engine.dialect.name == 'postgresql'
+
+  '''
+  search(term, page, per_page)
+    returns (questions, total) for one page of results, best match first
+  '''
+  def search(self, term, page, per_page):
+    offset = (max(page, 1) - 1) * per_page
+    if self.uses_tsvector():
+      return self._search_tsvector(term, offset, per_page)
+    return self._search_index(term, offset, per_page)
+
+  def _search_tsvector(self, term, offset, limit):
+    model = self.model
+    query = model.query
+    tokens = tokenize(term)
+    if tokens:
+      tsquery = self.db.func.to_tsquery(SEARCH_CONFIG, ' & '.join(token + ':*' for token in tokens))
+      vector = literal_column('%s.search_vector' % model.__tablename__)
+      query = query.filter(vector.op('@@')(tsquery)) \
+        .order_by(self.db.func.ts_rank(vector, tsquery).desc())
+    total = query.order_by(None).count()
+    questions = query.order_by(model.id).offset(offset).limit(limit).all()
+    return questions, total
+
+  def _search_index(self, term, offset, limit):
+    with self._lock:
+      ids = self._get_index().search(term)
+    page_ids = ids[offset:offset + limit]
+    if not page_ids:
+      return [], len(ids)
+    by_id = {question.id: question for question in self.model.query.filter(self.model.id.in_(page_ids))}
+    return [by_id[id] for id in page_ids if id in by_id], len(ids)
+
+  def _get_index(self):
+    # callers must hold _lock
+    if self._index is None:
+      index = InvertedIndex()
+      for id, question in self.db.session.query(self.model.id, self.model.question):
+        index.add(id, question)
+      self._index = index
+    return self._index
+
+  def add(self, id, question):
+    with self._lock:
+      if self._index is not None:
+        self._index.add(id, question)
+
+  def remove(self, id):
+    with self._lock:
+      if self._index is not None:
+        self._index.remove(id)
+
+  def reset(self):
+    with self._lock:
+      self._index = None
+
+  '''
+  install(connection=None, config=SEARCH_CONFIG)
+    adds the tsvector column, its GIN index and the trigger that keeps it
+    current to an existing PostgreSQL questions table; a no-op elsewhere
+    and once the column exists
+  '''
+  def install(self, connection=None, config=SEARCH_CONFIG):
+    if not self.uses_tsvector():
+      return False
+    if connection is None:
+      with self.db.engine.begin() as connection:
+        return self.install(connection, config)
+
+    table = self.model.__tablename__
+    exists = connection.execute(text(
+      "SELECT 1 FROM information_schema.columns "
+      "WHERE table_name = :table AND column_name = 'search_vector'"
+    ), table=table).scalar()
+    if exists:
+      return False
+    connection.execute(text(
+      "ALTER TABLE {table} ADD COLUMN search_vector tsvector;"
+      "UPDATE {table} SET search_vector = to_tsvector('{config}', coalesce(question, ''));"
+      "CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector);"
+      "CREATE TRIGGER {table}_search_vector_update BEFORE INSERT OR UPDATE ON {table} "
+      "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger(search_vector, '{config}', question);"
+      .format(table=table, config=config)
+    ))
+    return True
+
+  '''
+  reconfigure(connection, config=SEARCH_CONFIG)
+    switches the trigger of an installed tsvector column to another text
+    search configuration and recomputes every question's vector
+  '''
+  def reconfigure(self, connection, config=SEARCH_CONFIG):
+    if not self.uses_tsvector():
+      return False
+    connection.execute(text(
+      "DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table};"
+      "CREATE TRIGGER {table}_search_vector_update BEFORE INSERT OR UPDATE ON {table} "
+      "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger(search_vector, '{config}', question);"
+      "UPDATE {table} SET search_vector = to_tsvector('{config}', coalesce(question, ''));"
+      .format(table=self.model.__tablename__, config=config)
+    ))
+    return True
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+from sqlalchemy import event
+
+from bulk_import import RecordError, import_questions
+from models import setup_db, db, schema, reset_caches, Question, Category
+
+
+class BulkImportTestCase(unittest.TestCase):
+    """This class represents the bulk import test case"""
+
+    def setUp(self):
+        """Import into a fresh SQLite file, which needs no postgres server."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        setup_db(self.app, 'sqlite:///' + os.path.join(self.directory.name, 'trivia.db'))
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        schema.migrate()
+        Category('Science').insert()
+        Category('Art').insert()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        reset_caches()
+        self.ctx.pop()
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def imported(self):
+        return [(q.question, q.answer, q.category, q.difficulty) for q in Question.query.order_by(Question.id)]
+
+    def test_import_csv(self):
+        path = self.write('questions.csv',
+                          'question,answer,category,difficulty\n'
+                          'Who painted the Mona Lisa?,Leonardo,Art,2\n'
+                          '"What is H2O, commonly?",Water,1,\n')
+
+        self.assertEqual(import_questions(path), 2)
+        self.assertEqual(self.imported(), [
+            ('Who painted the Mona Lisa?', 'Leonardo', '2', 2),
+            ('What is H2O, commonly?', 'Water', '1', 1),
+        ])
+
+    def test_import_json_lines(self):
+        path = self.write('questions.jsonl',
+                          '{"question": "Q1", "answer": "A1", "category": 2, "difficulty": 3}\n'
+                          '\n'
+                          '{"question": "Q2", "answer": "A2", "category": "2"}\n'
+                          '{"question": "Q3", "answer": "A3", "category": null}\n'
+                          '{"question": "Q4", "answer": "A4", "category": " "}\n'
+                          '{"question": "Q5", "answer": "A5"}\n')
+
+        self.assertEqual(import_questions(path), 5)
+        self.assertEqual(self.imported(), [
+            ('Q1', 'A1', '2', 3),
+            ('Q2', 'A2', '2', 1),
+            ('Q3', 'A3', None, 1),
+            ('Q4', 'A4', None, 1),
+            ('Q5', 'A5', None, 1),
+        ])
+        self.assertEqual(Category.query.count(), 2)
+
+    def test_category_names_resolve_to_ids(self):
+        path = self.write('questions.jsonl',
+                          '{"question": "Q1", "answer": "A1", "category": "science"}\n'
+                          '{"question": "Q2", "answer": "A2", "category": "History"}\n'
+                          '{"question": "Q3", "answer": "A3", "category": "history "}\n')
+
+        import_questions(path)
+        history = Category.query.filter_by(type='History').one()
+
+        self.assertEqual([q[2] for q in self.imported()], ['1', str(history.id), str(history.id)])
+        self.assertEqual(Category.query.count(), 3)
+
+    def test_invalid_records(self):
+        cases = [
+            ('bad.jsonl', '{"question": "Q", "answer": "A"}\n{"question": \n', 'line 2: invalid JSON'),
+            ('list.jsonl', '["Q", "A", 1, 1]\n', 'line 1: expected a JSON object'),
+            ('number.jsonl', '{"question": "Q", "answer": 42}\n', 'line 1: question and answer must be text'),
+            ('category.jsonl', '{"question": "Q", "answer": "A", "category": [1]}\n',
+             'line 1: category must be an id or a name'),
+            ('difficulty.csv', 'question,answer,category,difficulty\nQ,A,1,hard\n', 'line 2: difficulty must be a number'),
+            ('missing.csv', 'question,answer\nQ,\n', 'line 2: question and answer are required'),
+        ]
+        for name, text, message in cases:
+            with self.subTest(name=name):
+                with self.assertRaises(RecordError) as raised:
+                    import_questions(self.write(name, text))
+                self.assertTrue(str(raised.exception).startswith(message), str(raised.exception))
+
+        self.assertEqual(Question.query.count(), 0)
+
+    def test_commits_each_chunk(self):
+        path = self.write('questions.jsonl', ''.join(
+            '{"question": "Q%d", "answer": "A", "category": 1}\n' % i for i in range(4)
+        ) + '{"question": "Q4"}\n')
+        commits = []
+        event.listen(db.engine, 'commit', lambda connection: commits.append(1))
+
+        with self.assertRaises(RecordError) as raised:
+            import_questions(path, chunk_size=2)
+
+        # the two full chunks stay committed when the record after them is invalid
+        self.assertEqual(raised.exception.line, 5)
+        self.assertEqual(len(commits), 2)
+        self.assertEqual([q[0] for q in self.imported()], ['Q0', 'Q1', 'Q2', 'Q3'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
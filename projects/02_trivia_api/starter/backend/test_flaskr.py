@@ -1,39 +1,384 @@
 import os
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
+from unittest import mock
+
+from sqlalchemy import create_engine, event, text
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import db, schema, reset_caches, category_map, question_sampler, question_search, response_cache, Question, Category
 
+DATABASE_HOST = os.environ.get('TEST_DATABASE_HOST', 'localhost:5432')
+DATABASE_NAME = 'trivia_test'
 
-class TriviaTestCase(unittest.TestCase):
-    """This class represents the trivia test case"""
+app = None
+
+
+def database_name():
+    """pytest-xdist workers (python -m pytest -n auto) each get their own copy of trivia_test."""
+    worker = os.environ.get('PYTEST_XDIST_WORKER')
+    return '{}_{}'.format(DATABASE_NAME, worker) if worker else DATABASE_NAME
+
+
+def create_worker_database(name):
+    """Clone trivia_test, data included, unless the worker database already exists."""
+    engine = create_engine('postgres://{}/postgres'.format(DATABASE_HOST), isolation_level='AUTOCOMMIT')
+    with engine.connect() as connection:
+        exists = connection.execute(text('SELECT 1 FROM pg_database WHERE datname = :name'), name=name).scalar()
+        if not exists:
+            connection.execute('CREATE DATABASE "{}" TEMPLATE "{}"'.format(name, DATABASE_NAME))
+    engine.dispose()
+
+
+def setUpModule():
+    """Build the app and bring the schema up to date once for the whole run."""
+    global app
+    name = database_name()
+    if name != DATABASE_NAME:
+        create_worker_database(name)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'postgres://{}/{}'.format(DATABASE_HOST, name),
+        'DATABASE_POOL_METRICS_URL': '/internal/db-pool',
+        'METRICS_URL': '/internal/metrics',
+    })
+    with app.app_context():
+        schema.migrate()
+
+
+def tearDownModule():
+    with app.app_context():
+        db.get_engine(app).dispose()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Base class for tests that run against the trivia_test database"""
 
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
-        self.client = self.app.test_client
-        self.database_name = "trivia_test"
-        self.database_path = "postgres://{}/{}".format('localhost:5432', self.database_name)
-        setup_db(self.app, self.database_path)
-
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
-    
+        """Run the test inside a transaction that tearDown rolls back.
+
+        Commits made by the app only release a SAVEPOINT, which is restarted
+        straight away, so nothing a test writes is ever visible to the next.
+        """
+        self.app = app
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        self.session = db.create_scoped_session(options={'bind': self.connection, 'binds': {}})
+        self.session.begin_nested()
+        event.listen(self.session, 'after_transaction_end', self.restart_savepoint)
+        self.app_session = db.session
+        db.session = self.session
+
     def tearDown(self):
-        """Executed after reach test"""
-        pass
+        """Roll back everything the test wrote."""
+        db.session = self.app_session
+        event.remove(self.session, 'after_transaction_end', self.restart_savepoint)
+        self.session.remove()
+        self.transaction.rollback()
+        self.connection.close()
+        reset_caches()
+        self.ctx.pop()
+
+    @staticmethod
+    def restart_savepoint(session, transaction):
+        if transaction.nested and not transaction._parent.nested:
+            session.expire_all()
+            session.begin_nested()
+
+
+class TriviaTestCase(DatabaseTestCase):
+    """This class represents the trivia test case"""
 
     """
     TODO
     Write at least one test for each test for successful operation and for expected errors.
     """
 
+    def test_get_categories(self):
+        res = self.client().get('/categories')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(len(data['categories']))
+        self.assertTrue(res.headers.get('ETag'))
+
+    def test_304_categories_not_modified(self):
+        etag = self.client().get('/categories').headers['ETag']
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_categories_etag_changes_after_insert(self):
+        etag = self.client().get('/categories').headers['ETag']
+        Category('Cooking').insert()
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertIn('Cooking', data['categories'].values())
+
+    def test_categories_cache_entries_expire(self):
+        with mock.patch.object(response_cache, 'max_age', 0):
+            self.client().get('/categories')
+            res = self.client().get('/categories')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(response_cache.stats()['hits'], 0)
+        self.assertEqual(response_cache.stats()['misses'], 2)
+
+    def test_category_map_expires(self):
+        category_map()
+        db.session.execute("INSERT INTO categories (type) VALUES ('Written elsewhere')")
+        self.assertNotIn('Written elsewhere', category_map().values())
+
+        with mock.patch.object(response_cache, 'max_age', 0):
+            self.assertIn('Written elsewhere', category_map().values())
+
+    def test_get_paginated_questions(self):
+        res = self.client().get('/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['total_questions'])
+        self.assertLessEqual(len(data['questions']), 10)
+        self.assertTrue(len(data['categories']))
+
+    def test_get_questions_after_keyset(self):
+        first = json.loads(self.client().get('/questions').data)['questions']
+        res = self.client().get('/questions?after={}'.format(first[0]['id']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['questions'][0]['id'], first[1]['id'])
+
+    def test_search_questions(self):
+        res = self.client().post('/questions/search', json={'searchTerm': 'title'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['total_questions'])
+        for question in data['questions']:
+            self.assertIn('title', question['question'].lower())
+
+    def test_search_questions_without_results(self):
+        res = self.client().post('/questions/search', json={'searchTerm': 'xyzzyplugh'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], 0)
+        self.assertEqual(data['questions'], [])
+
+    def test_play_quiz_skips_previous_questions(self):
+        previous_questions = []
+        while True:
+            res = self.client().post('/quizzes', json={
+                'previous_questions': previous_questions,
+                'quiz_category': {'type': 'Science', 'id': 1}
+            })
+            data = json.loads(res.data)
+            self.assertEqual(res.status_code, 200)
+            if data['question'] is None:
+                break
+            self.assertEqual(data['question']['category'], 1)
+            self.assertNotIn(data['question']['id'], previous_questions)
+            previous_questions.append(data['question']['id'])
+
+        self.assertTrue(len(previous_questions))
+
+    def test_422_play_quiz_with_malformed_body(self):
+        res = self.client().post('/quizzes', json={'previous_questions': 'none'})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_422_play_quiz_with_unhashable_previous_questions(self):
+        res = self.client().post('/quizzes', json={'previous_questions': [[1], {'id': 2}]})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_422_play_quiz_with_malformed_category(self):
+        res = self.client().post('/quizzes', json={'previous_questions': [], 'quiz_category': 'Science'})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_play_quiz_skips_questions_deleted_elsewhere(self):
+        question_sampler.sample()
+        # delete rows behind the sampler's back, as another process would
+        db.session.query(Question).filter(Question.category == '1').delete(synchronize_session=False)
+        db.session.commit()
+
+        res = self.client().post('/quizzes', json={
+            'previous_questions': [],
+            'quiz_category': {'type': 'Science', 'id': 1}
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIsNone(data['question'])
+        self.assertIsNone(question_sampler.sample(1))
+
+    def test_play_quiz_draws_questions_added_elsewhere(self):
+        seen = [id for id, in db.session.query(Question.id).filter(Question.category == '1')]
+        question_sampler.sample()
+        # insert a row behind the sampler's back, as another process would
+        db.session.execute("INSERT INTO questions (question, answer, category, difficulty) "
+                           "VALUES ('Added elsewhere?', 'Yes', '1', 1)")
+        body = {'previous_questions': seen, 'quiz_category': {'type': 'Science', 'id': 1}}
+        self.assertIsNone(json.loads(self.client().post('/quizzes', json=body).data)['question'])
+
+        with mock.patch.object(question_sampler, 'max_age', 0):
+            data = json.loads(self.client().post('/quizzes', json=body).data)
+
+        self.assertEqual(data['question']['question'], 'Added elsewhere?')
+
+    def test_play_quiz_skips_questions_moved_elsewhere(self):
+        question_sampler.sample()
+        db.session.query(Question).filter(Question.category == '1') \
+            .update({'category': '2'}, synchronize_session=False)
+        db.session.commit()
+
+        res = self.client().post('/quizzes', json={
+            'previous_questions': [],
+            'quiz_category': {'type': 'Science', 'id': 1}
+        })
+
+        self.assertIsNone(json.loads(res.data)['question'])
+
+    def test_404_sent_requesting_beyond_valid_page(self):
+        res = self.client().get('/questions?page=1000')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_get_questions_counts_inserted_question(self):
+        total = json.loads(self.client().get('/questions').data)['total_questions']
+        Question('Who wrote this test?', 'Nobody', '1', 1).insert()
+
+        res = self.client().get('/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], total + 1)
+
+    def test_get_pool_metrics(self):
+        self.client().get('/categories')
+        res = self.client().get('/internal/db-pool')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['pool']['pool'], 'TimedQueuePool')
+        self.assertGreater(data['pool']['checkouts'], 0)
+        self.assertLessEqual(data['pool']['checked_out'], data['pool']['size'] + data['pool']['overflow'])
+
+    def test_404_pool_metrics_disabled_by_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DATABASE_POOL_METRICS_URL', None)
+            other = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI']})
+        res = other.test_client().get('/internal/db-pool')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_get_request_metrics(self):
+        self.client().get('/categories')
+        res = self.client().get('/internal/metrics')
+        body = res.get_data(as_text=True)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/categories",status="200"}', body)
+        self.assertIn('http_request_db_queries_count{route="/categories"}', body)
+
+    def test_404_response_cache_metrics_disabled_by_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('RESPONSE_CACHE_METRICS_URL', None)
+            other = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI']})
+        res = other.test_client().get('/internal/response-cache')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_404_request_metrics_disabled_by_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('METRICS_URL', None)
+            other = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI']})
+        res = other.test_client().get('/internal/metrics')
+
+        self.assertEqual(res.status_code, 404)
+
+
+class QuestionSearchTests:
+    """Search behaviour both backends must share; mixed into one test case per backend"""
+
+    QUESTIONS = [
+        'Which zebra is the fastest?',
+        'The zebras of the savanna',
+        'Is a zebrafish a fish?',
+        'Why do quokkas smile?',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.ids = []
+        for text in self.QUESTIONS:
+            question = Question(text, 'answer', '1', 1)
+            question.insert()
+            self.ids.append(question.id)
+
+    def search(self, term, page=1, per_page=1000):
+        questions, total = question_search.search(term, page, per_page)
+        return [question.id for question in questions if question.id in self.ids], total
+
+    def test_prefix_matches(self):
+        fastest, savanna, zebrafish, _ = self.ids
+
+        self.assertEqual(sorted(self.search('zebra')[0]), [fastest, savanna, zebrafish])
+        self.assertEqual(sorted(self.search('ZEBRA')[0]), [fastest, savanna, zebrafish])
+
+    def test_every_word_must_match(self):
+        zebrafish = self.ids[2]
+
+        self.assertEqual(self.search('zebra fish')[0], [zebrafish])
+        self.assertEqual(self.search('zebra quokka'), ([], 0))
+
+    def test_stop_words_are_searched(self):
+        fastest, savanna, _, _ = self.ids
+
+        self.assertEqual(sorted(self.search('the zebra')[0]), [fastest, savanna])
+        self.assertEqual(self.search('why do')[0], [self.ids[3]])
+
+    def test_more_occurrences_rank_first(self):
+        fastest, savanna, _, _ = self.ids
+        ranked = self.search('the zebra')[0]
+
+        self.assertEqual(ranked, [savanna, fastest])
+
+    def test_pages(self):
+        first, total = self.search('zebra', page=1, per_page=2)
+        second, _ = self.search('zebra', page=2, per_page=2)
+
+        self.assertEqual(total, 3)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(sorted(first + second), sorted(self.ids[:3]))
+
+
+class TsvectorSearchTestCase(QuestionSearchTests, DatabaseTestCase):
+    """The search tests against the tsvector column and its GIN index"""
+
+
+class InvertedIndexSearchTestCase(QuestionSearchTests, DatabaseTestCase):
+    """The search tests against the in-memory index used on SQLite"""
+
+    def setUp(self):
+        patcher = mock.patch.object(question_search, 'uses_tsvector', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
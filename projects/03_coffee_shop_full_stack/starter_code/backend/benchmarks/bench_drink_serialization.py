@@ -0,0 +1,68 @@
+'''
+Micro-benchmark for Drink.short() / Drink.long()
+
+Compares the per-drink serialization cost of the previous implementation,
+which decoded the recipe blob on every call (and printed it in short()),
+with the cached parsed recipe.
+
+Run from the backend directory:
+    python -m benchmarks.bench_drink_serialization [drinks] [rounds]
+'''
+import contextlib
+import io
+import json
+import sys
+import timeit
+
+from src.database.models import Drink
+
+
+def short_before(drink):
+    print(json.loads(drink.recipe))
+    short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(drink.recipe)]
+    return {
+        'id': drink.id,
+        'title': drink.title,
+        'recipe': short_recipe
+    }
+
+
+def long_before(drink):
+    return {
+        'id': drink.id,
+        'title': drink.title,
+        'recipe': json.loads(drink.recipe)
+    }
+
+
+def make_drinks(count):
+    recipe = json.dumps([
+        {'name': 'espresso', 'color': 'brown', 'parts': 1},
+        {'name': 'milk', 'color': 'white', 'parts': 2},
+        {'name': 'foam', 'color': 'grey', 'parts': 1}
+    ])
+    return [Drink(id=i, title='drink %d' % i, recipe=recipe) for i in range(count)]
+
+
+def per_drink_us(fn, drinks, rounds):
+    # stdout is swallowed so the old print() is measured without flooding the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = timeit.timeit(lambda: [fn(d) for d in drinks], number=rounds)
+    return seconds / (len(drinks) * rounds) * 1e6
+
+
+def main(count=1000, rounds=20):
+    drinks = make_drinks(count)
+    results = [
+        ('short() before', per_drink_us(short_before, drinks, rounds)),
+        ('short() after', per_drink_us(Drink.short, drinks, rounds)),
+        ('long() before', per_drink_us(long_before, drinks, rounds)),
+        ('long() after', per_drink_us(Drink.long, drinks, rounds)),
+    ]
+    print('%d drinks x %d rounds' % (count, rounds))
+    for name, us in results:
+        print('%-16s %8.2f us/drink' % (name, us))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -1,14 +1,18 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from . import fast_json, instrumentation
+from .fast_json import jsonify
+from .database.models import db_drop_and_create_all, setup_db, Drink, response_cache
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
 setup_db(app)
+fast_json.init_app(app)
+instrumentation.init_app(app)
 CORS(app)
 
 '''
@@ -27,6 +31,14 @@ CORS(app)
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks')
+@response_cache.cached('drinks')
+def get_drinks():
+    drinks = Drink.query.order_by(Drink.id).all()
+    return jsonify({
+        "success": True,
+        "drinks": [drink.short() for drink in drinks]
+    })
 
 
 '''
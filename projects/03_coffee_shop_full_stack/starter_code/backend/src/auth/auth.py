@@ -1,9 +1,12 @@
+import copy
 import json
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
 from urllib.request import urlopen
 
+from .token_cache import TokenCache
+
 
 AUTH0_DOMAIN = 'udacity-fsnd.auth0.com'
 ALGORITHMS = ['RS256']
@@ -63,6 +66,16 @@ def check_permissions(permission, payload):
 def verify_decode_jwt(token):
     raise Exception('Not Implemented')
 
+'''
+token_cache
+    verified tokens are remembered until their exp claim so a repeated
+    bearer token is authorized with a dictionary lookup instead of a
+    second RS256 signature check; permissions are still checked by
+    check_permissions on every request
+    token_cache.stats() reports the hit and miss counters
+'''
+token_cache = TokenCache(max_size=1024)
+
 '''
 @TODO implement @requires_auth(permission) decorator method
     @INPUTS
@@ -78,7 +91,13 @@ def requires_auth(permission=''):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
+            cached = token_cache.get(token)
+            if cached is None:
+                payload = verify_decode_jwt(token)
+                token_cache.put(token, payload)
+            else:
+                # each request gets its own copy to change as it likes
+                payload = copy.deepcopy(cached.payload)
             check_permissions(permission, payload)
             return f(payload, *args, **kwargs)
 
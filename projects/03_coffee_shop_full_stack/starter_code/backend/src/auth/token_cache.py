@@ -0,0 +1,93 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+'''
+CachedToken
+a verified token: its decoded payload and when it expires
+    the payload is the cache's own copy; callers must not change it
+'''
+class CachedToken:
+    __slots__ = ('payload', 'expires_at')
+
+    def __init__(self, payload, expires_at):
+        self.payload = payload
+        self.expires_at = expires_at
+
+
+'''
+TokenCache
+a bounded LRU cache of verified jwts
+    tokens are keyed by their sha256 digest so raw bearer tokens are never kept
+    entries expire at the token's exp claim
+    tokens without an exp claim are never cached
+'''
+class TokenCache:
+    def __init__(self, max_size=1024, clock=time.time):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    '''
+    get(token)
+        returns the CachedToken for a previously verified token
+        or None if it was never seen, was evicted or has expired
+    '''
+    def get(self, token):
+        key = self.digest(token)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    '''
+    put(token, payload)
+        stores a copy of a verified payload, so later changes the caller
+        makes to its own payload are not cached
+        returns the new CachedToken
+    '''
+    def put(self, token, payload):
+        entry = CachedToken(copy.deepcopy(payload), payload.get('exp'))
+        if not isinstance(entry.expires_at, (int, float)) or entry.expires_at <= self._clock():
+            return entry
+
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
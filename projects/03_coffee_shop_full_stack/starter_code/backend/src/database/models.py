@@ -1,23 +1,43 @@
 import os
 from sqlalchemy import Column, String, Integer
-from flask_sqlalchemy import SQLAlchemy
 import json
+from functools import partial
+
+from .pool import PooledSQLAlchemy
+from .response_cache import ResponseCache
+from .unit_of_work import UnitOfWork
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
-db = SQLAlchemy()
+db = PooledSQLAlchemy()
+
+'''
+unit_of_work
+    batches the insert/update/delete helpers into one commit per request
+'''
+unit_of_work = UnitOfWork(db)
+
+'''
+response_cache
+    cached GET responses, invalidated by the Drink write helpers
+'''
+response_cache = ResponseCache()
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    pool settings are read from the DATABASE_POOL_* config, see pool.py
 '''
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.app = app
     db.init_app(app)
+    if app.config.get('UNIT_OF_WORK', True):
+        unit_of_work.init_app(app)
+    response_cache.init_app(app)
 
 '''
 db_drop_and_create_all()
@@ -42,17 +62,30 @@ class Drink(db.Model):
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
     recipe =  Column(String(180), nullable=False)
 
+    '''
+    parsed_recipe()
+        returns the decoded recipe as a (short_recipe, long_recipe) pair
+        the blob is decoded once and reused until self.recipe is replaced,
+        whether by assignment or by reloading the row from the database
+        every call returns fresh lists, which the caller may change
+    '''
+    def parsed_recipe(self):
+        cached = self.__dict__.get('_parsed_recipe')
+        if cached is None or cached[0] is not self.recipe:
+            long_recipe = json.loads(self.recipe)
+            short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in long_recipe]
+            cached = self._parsed_recipe = (self.recipe, short_recipe, long_recipe)
+        return [dict(r) for r in cached[1]], [dict(r) for r in cached[2]]
+
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': self.parsed_recipe()[0]
         }
 
     '''
@@ -63,12 +96,13 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.parsed_recipe()[1]
         }
 
     '''
     insert()
         inserts a new model into a database
+        inside a request the change is committed with the rest of the request
         the model must have a unique name
         the model must have a unique id or null id
         EXAMPLE
@@ -77,7 +111,8 @@ class Drink(db.Model):
     '''
     def insert(self):
         db.session.add(self)
-        db.session.commit()
+        unit_of_work.commit(flush=True)
+        unit_of_work.on_commit(partial(response_cache.bump, 'drinks'))
 
     '''
     delete()
@@ -89,7 +124,8 @@ class Drink(db.Model):
     '''
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        unit_of_work.commit(flush=True)
+        unit_of_work.on_commit(partial(response_cache.bump, 'drinks'))
 
     '''
     update()
@@ -101,7 +137,8 @@ class Drink(db.Model):
             drink.update()
     '''
     def update(self):
-        db.session.commit()
+        unit_of_work.commit(flush=True)
+        unit_of_work.on_commit(partial(response_cache.bump, 'drinks'))
 
     def __repr__(self):
         return json.dumps(self.short())
\ No newline at end of file
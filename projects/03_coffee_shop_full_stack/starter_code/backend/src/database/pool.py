@@ -0,0 +1,184 @@
+# Shared helper, copied into every project that uses it so each one stays
+# standalone. Copies differ only in indent width, which follows each project;
+# change them together. test_shared_helpers.py at the repo root checks this.
+import os
+import threading
+import time
+
+from flask import jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+'''
+pool settings
+    read from the app config, then from environment variables of the same
+    name, then from these defaults
+        DATABASE_POOL_SIZE          connections kept open per process
+        DATABASE_MAX_OVERFLOW       extra connections opened under load
+        DATABASE_POOL_TIMEOUT       seconds to wait for a free connection
+        DATABASE_POOL_RECYCLE       seconds before a connection is replaced, -1 never
+        DATABASE_POOL_PRE_PING      test each connection before handing it out
+        DATABASE_STATEMENT_TIMEOUT  milliseconds before postgres cancels a query, 0 never
+        DATABASE_POOL_METRICS_URL   where pool metrics are served, off unless set
+'''
+DEFAULTS = {
+    'DATABASE_POOL_SIZE': 5,
+    'DATABASE_MAX_OVERFLOW': 10,
+    'DATABASE_POOL_TIMEOUT': 30,
+    'DATABASE_POOL_RECYCLE': 1800,
+    'DATABASE_POOL_PRE_PING': True,
+    'DATABASE_STATEMENT_TIMEOUT': 0,
+    'DATABASE_POOL_METRICS_URL': '',
+}
+
+
+def setting(app, name):
+    default = DEFAULTS[name]
+    value = app.config.get(name)
+    if value is None:
+        value = os.environ.get(name)
+    if value is None:
+        return default
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return type(default)(value)
+
+
+'''
+PoolMetrics
+    live counters for the connection pool of the current engine
+        checked_out and overflow come from the pool itself
+        wait time is how long checkouts blocked on a full pool, so slow requests
+        with little wait point at the database rather than pool exhaustion
+'''
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.engine = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    '''
+    pool_class()
+        a QueuePool that times every checkout into these metrics
+    '''
+    def pool_class(self):
+        metrics = self
+
+        class TimedQueuePool(QueuePool):
+            def _do_get(self):
+                start = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except exc.TimeoutError:
+                    metrics.record_timeout()
+                    raise
+                finally:
+                    metrics.record_wait(time.perf_counter() - start)
+
+        return TimedQueuePool
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def attach(self, engine):
+        self.reset()
+        self.engine = engine
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        pool = self.engine.pool if self.engine is not None else None
+        queued = isinstance(pool, QueuePool)
+        with self._lock:
+            return {
+                'pool': type(pool).__name__ if pool is not None else None,
+                'size': pool.size() if queued else None,
+                'checked_out': pool.checkedout() if queued else None,
+                'checked_in': pool.checkedin() if queued else None,
+                'overflow': max(pool.overflow(), 0) if queued else None,
+                'checkouts': self.checkouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_total, 6),
+                'wait_seconds_max': round(self.wait_max, 6),
+                'wait_seconds_avg': round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0
+            }
+
+
+'''
+PooledSQLAlchemy
+    SQLAlchemy with the pool settings above applied when the engine is created,
+    so they follow whatever SQLALCHEMY_DATABASE_URI is set at that point
+    sqlite keeps the pool flask-sqlalchemy picks for it; only pre-ping and
+    recycle apply there
+    explicit SQLALCHEMY_ENGINE_OPTIONS still take priority
+'''
+class PooledSQLAlchemy(SQLAlchemy):
+    def __init__(self, *args, **kwargs):
+        self.pool_metrics = PoolMetrics()
+        super().__init__(*args, **kwargs)
+
+    def init_app(self, app):
+        super().init_app(app)
+        url = setting(app, 'DATABASE_POOL_METRICS_URL')
+        if url and 'pool_metrics' not in app.view_functions:
+            app.add_url_rule(url, 'pool_metrics', self.pool_metrics_view)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        options['pool_pre_ping'] = setting(app, 'DATABASE_POOL_PRE_PING')
+        options['pool_recycle'] = setting(app, 'DATABASE_POOL_RECYCLE')
+        backend = sa_url.get_backend_name()
+        if backend != 'sqlite':
+            options['poolclass'] = self.pool_metrics.pool_class()
+            options['pool_size'] = setting(app, 'DATABASE_POOL_SIZE')
+            options['max_overflow'] = setting(app, 'DATABASE_MAX_OVERFLOW')
+            options['pool_timeout'] = setting(app, 'DATABASE_POOL_TIMEOUT')
+        statement_timeout = setting(app, 'DATABASE_STATEMENT_TIMEOUT')
+        if statement_timeout and backend == 'postgresql':
+            options['connect_args'] = {'options': '-c statement_timeout={}'.format(statement_timeout)}
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        self.pool_metrics.attach(engine)
+        return engine
+
+    '''
+    GET /internal/db-pool
+        live pool metrics, for internal monitoring only; do not route it publicly
+    '''
+    def pool_metrics_view(self):
+        # creates the engine if no request has used the database yet
+        self.get_engine()
+        return jsonify({'success': True, 'pool': self.pool_metrics.snapshot()})
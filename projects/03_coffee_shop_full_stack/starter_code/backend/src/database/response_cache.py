@@ -0,0 +1,132 @@
+# Shared helper, copied into every project that uses it so each one stays
+# standalone. Copies differ only in indent width, which follows each project;
+# change them together. test_shared_helpers.py at the repo root checks this.
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request
+
+'''
+ResponseCache
+    in-memory cache of whole JSON responses for read-heavy GET endpoints
+
+    each cached view names the data it depends on, e.g. 'categories' or
+    'drinks'. model write hooks bump() the version of that data once their
+    change is committed, and a cached response is only served while the
+    versions it was built from are current
+
+    every cached response carries a strong ETag, so a client that sends it
+    back in If-None-Match gets a bodiless 304 while nothing has changed
+
+    versions are kept per process: with several workers, a write bumps only
+    the versions of the worker that served it. entries therefore also expire
+    after max_age seconds, which bounds how stale another worker's response
+    can be
+'''
+class ResponseCache:
+    def __init__(self, max_entries=256, max_age=30):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._versions = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.clear()
+
+    '''
+    init_app(app)
+        serves the cache metrics at RESPONSE_CACHE_METRICS_URL, read from the app
+        config or the environment; off unless set
+        RESPONSE_CACHE_MAX_AGE overrides max_age
+    '''
+    def init_app(self, app):
+        max_age = app.config.get('RESPONSE_CACHE_MAX_AGE', os.environ.get('RESPONSE_CACHE_MAX_AGE'))
+        if max_age is not None:
+            self.max_age = float(max_age)
+        url = app.config.get('RESPONSE_CACHE_METRICS_URL', os.environ.get('RESPONSE_CACHE_METRICS_URL'))
+        if url and 'response_cache_metrics' not in app.view_functions:
+            app.add_url_rule(url, 'response_cache_metrics', self.metrics_view)
+
+    def bump(self, *names):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.not_modified = 0
+
+    '''
+    cached(*names)
+        decorates a GET view whose response only changes when one of `names`
+        is bumped; only 200 responses are cached
+    '''
+    def cached(self, *names):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.endpoint, request.full_path)
+                with self._lock:
+                    # captured before the view runs, so a write committed meanwhile
+                    # leaves this entry already out of date rather than stale
+                    versions = tuple(self._versions.get(name, 0) for name in names)
+                    entry = self._entries.get(key)
+                    now = time.monotonic()
+                    if entry is not None and entry[0] == versions and now < entry[1] + self.max_age:
+                        self.hits += 1
+                    else:
+                        entry = None
+                        self.misses += 1
+
+                if entry is not None:
+                    _, _, body, etag, mimetype = entry
+                    response = Response(body, mimetype=mimetype)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.sha256(body).hexdigest()
+                    self._store(key, (versions, now, body, etag, response.mimetype))
+
+                response.set_etag(etag)
+                # browsers revalidate every time instead of trusting a local copy
+                response.headers['Cache-Control'] = 'no-cache'
+                response = response.make_conditional(request)
+                if response.status_code == 304:
+                    with self._lock:
+                        self.not_modified += 1
+                return response
+            return wrapper
+        return decorator
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = entry
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'versions': dict(self._versions)
+            }
+
+    '''
+    GET /internal/response-cache
+        cache hit ratio and counters, for internal monitoring only
+    '''
+    def metrics_view(self):
+        return jsonify({'success': True, 'response_cache': self.stats()})
@@ -0,0 +1,86 @@
+# Shared helper, copied into every project that uses it so each one stays
+# standalone. Copies differ only in indent width, which follows each project;
+# change them together. test_shared_helpers.py at the repo root checks this.
+from flask import g, has_request_context
+
+'''
+UnitOfWork
+    request-scoped batching for the model insert/update/delete helpers
+
+    outside a request every helper commits immediately, as before. inside a
+    request the helpers flush their changes, so ids are assigned and
+    constraint errors are raised in the view while it can still answer with
+    a 4xx, and only the commit is deferred: the whole request is committed
+    once, after the view returns a successful response. error responses and
+    unhandled exceptions roll the request back instead
+
+    callbacks passed to on_commit() run only once the data is committed, so
+    in-memory caches never see changes that were rolled back
+'''
+class UnitOfWork:
+    def __init__(self, db):
+        self.db = db
+        self.commits = 0
+
+    def init_app(self, app):
+        app.before_request(self._begin)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+
+    def active(self):
+        return has_request_context() and g.get('unit_of_work') is not None
+
+    '''
+    commit(flush=False)
+        what the model helpers call instead of db.session.commit()
+        flush=True writes the pending rows right away, to assign ids and to
+        raise constraint errors before the view returns
+    '''
+    def commit(self, flush=False):
+        if not self.active():
+            self._commit()
+            return
+        if flush:
+            self.db.session.flush()
+        g.unit_of_work_dirty = True
+
+    '''
+    on_commit(callback)
+        runs callback now outside a request, or after the request is committed
+    '''
+    def on_commit(self, callback):
+        if self.active():
+            g.unit_of_work.append(callback)
+        else:
+            callback()
+
+    def _commit(self):
+        self.db.session.commit()
+        self.commits += 1
+
+    def _begin(self):
+        g.unit_of_work = []
+        g.unit_of_work_dirty = False
+
+    def _finish(self, response):
+        callbacks = g.pop('unit_of_work', None)
+        if not g.pop('unit_of_work_dirty', False):
+            return response
+        if response.status_code >= 400:
+            self.db.session.rollback()
+            return response
+
+        try:
+            self._commit()
+        except Exception:
+            self.db.session.rollback()
+            raise
+        for callback in callbacks:
+            callback()
+        return response
+
+    def _discard(self, exception=None):
+        # still pending here only if the request failed before after_request
+        g.pop('unit_of_work', None)
+        if g.pop('unit_of_work_dirty', False):
+            self.db.session.rollback()
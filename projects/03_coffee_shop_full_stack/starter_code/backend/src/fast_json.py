@@ -0,0 +1,173 @@
+# Shared helper, copied into every project that uses it so each one stays
+# standalone. Copies differ only in indent width, which follows each project;
+# change them together. test_shared_helpers.py at the repo root checks this.
+import datetime
+import decimal
+import json
+import uuid
+
+from flask import current_app, has_app_context
+
+try:
+    import orjson
+except ImportError:
+    # the stdlib encoder is used instead
+    orjson = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:
+    # flask < 2.2 has no provider API; views use jsonify() from this module
+    DefaultJSONProvider = None
+
+'''
+default(obj)
+    encodes the values the stdlib encoder does not handle: dates, datetimes
+    and times as ISO 8601, as orjson writes them natively, and decimals and
+    uuids as strings, as flask does. models are not guessed at; views pass
+    their format() output
+'''
+def default(obj):
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+def key_text(key):
+    if key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    if isinstance(key, (datetime.date, datetime.time, uuid.UUID)):
+        return default(key)
+    raise TypeError('keys must be str, int, float, bool or None, not {}'.format(type(key).__name__))
+
+
+CONTAINERS = (dict, list, tuple)
+
+'''
+with_text_keys(obj)
+    a copy of obj with every dict key written as its JSON string, the way
+    orjson writes non-str keys, so both backends sort keys as text: a
+    category map sorts "1", "10", "2" with either one
+'''
+def with_text_keys(obj):
+    if isinstance(obj, dict):
+        return {
+            key if isinstance(key, str) else key_text(key):
+                with_text_keys(value) if isinstance(value, CONTAINERS) else value
+            for key, value in obj.items()
+        }
+    return [with_text_keys(value) if isinstance(value, CONTAINERS) else value for value in obj]
+
+
+def stdlib_dumps(obj, sort_keys=False, indent=None):
+    separators = (',', ':') if indent is None else None
+    if isinstance(obj, CONTAINERS):
+        obj = with_text_keys(obj)
+    text = json.dumps(obj, default=default, sort_keys=sort_keys, indent=indent,
+                      separators=separators, ensure_ascii=False)
+    return text.encode('utf-8')
+
+
+def orjson_dumps(obj, sort_keys=False, indent=None):
+    # int keys such as category ids are written as strings, as with_text_keys does
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=default, option=option)
+
+
+'''
+BACKENDS
+    encoders by name, each dumps(obj, sort_keys, indent) -> utf-8 bytes
+    register another one with BACKENDS['name'] = dumps and select it with the
+    JSON_BACKEND config; 'auto' (the default) picks the fastest installed
+'''
+BACKENDS = {'json': stdlib_dumps}
+if orjson is not None:
+    BACKENDS['orjson'] = orjson_dumps
+
+
+def backend_name(name='auto'):
+    if name == 'auto':
+        return 'orjson' if 'orjson' in BACKENDS else 'json'
+    if name not in BACKENDS:
+        raise ValueError('unknown JSON backend {!r}, expected one of {}'.format(name, sorted(BACKENDS)))
+    return name
+
+
+'''
+current_backend()
+    the name of the backend selected by the JSON_BACKEND config of the
+    current app, or of the fastest installed one outside an app context
+'''
+def current_backend():
+    name = 'auto'
+    if has_app_context():
+        name = current_app.config.get('JSON_BACKEND', 'auto')
+    return backend_name(name)
+
+
+def dumps(obj, sort_keys=False, indent=None):
+    return BACKENDS[current_backend()](obj, sort_keys=sort_keys, indent=indent)
+
+
+'''
+jsonify(*args, **kwargs)
+    a drop-in for flask.jsonify that encodes straight to the response bytes
+    with the configured backend, honouring JSON_SORT_KEYS and pretty printing
+    when flask would: in debug mode or when JSONIFY_PRETTYPRINT_REGULAR is
+    set, or on flask 2.2+ when app.json.compact is False, or None in debug
+'''
+def jsonify(*args, **kwargs):
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    if len(args) == 1:
+        data = args[0]
+    else:
+        data = list(args) or kwargs
+
+    app = current_app
+    # flask 2.2+ leaves these settings None and keeps them on app.json instead
+    sort_keys = app.config.get('JSON_SORT_KEYS')
+    if sort_keys is None:
+        sort_keys = getattr(getattr(app, 'json', None), 'sort_keys', True)
+    pretty = app.config.get('JSONIFY_PRETTYPRINT_REGULAR')
+    if pretty is None:
+        compact = getattr(getattr(app, 'json', None), 'compact', None)
+        pretty = compact is False or (compact is None and app.debug)
+    else:
+        pretty = pretty or app.debug
+    indent = 2 if pretty else None
+    body = dumps(data, sort_keys=sort_keys, indent=indent)
+    return app.response_class(body + b'\n', mimetype=app.config.get('JSONIFY_MIMETYPE') or 'application/json')
+
+
+if DefaultJSONProvider is not None:
+    '''
+    FastJSONProvider
+        on flask 2.2+ the same encoding for flask.jsonify and app.json.dumps
+    '''
+    class FastJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys), indent=kwargs.get('indent')).decode('utf-8')
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            # flask pretty prints when compact is False, or left None in debug mode
+            indent = 2 if self.compact is False or (self.compact is None and self._app.debug) else None
+            return self._app.response_class(dumps(obj, sort_keys=self.sort_keys, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+'''
+init_app(app)
+    checks the JSON_BACKEND config and, where flask supports it, makes
+    flask.jsonify use the same backend
+'''
+def init_app(app):
+    backend_name(app.config.setdefault('JSON_BACKEND', 'auto'))
+    if DefaultJSONProvider is not None:
+        app.json = FastJSONProvider(app)
@@ -0,0 +1,77 @@
+import datetime
+import unittest
+import uuid
+
+import flask
+from flask import Flask
+
+from src import fast_json
+
+
+class Model:
+    def format(self):
+        return {'id': 1}
+
+
+class FastJSONTestCase(unittest.TestCase):
+    """This class represents the fast JSON encoding test case"""
+
+    def encodings(self, obj, sort_keys=False):
+        return {name: dumps(obj, sort_keys=sort_keys) for name, dumps in fast_json.BACKENDS.items()}
+
+    def assertBackendsAgree(self, obj, expected, sort_keys=False):
+        for name, body in self.encodings(obj, sort_keys).items():
+            with self.subTest(backend=name, sort_keys=sort_keys):
+                self.assertEqual(body, expected)
+
+    def test_non_str_keys(self):
+        self.assertBackendsAgree({2: 'a', True: 'b', None: 'c', 1.5: 'd'},
+                                 b'{"2":"a","true":"b","null":"c","1.5":"d"}')
+        self.assertBackendsAgree({datetime.date(2020, 1, 2): 1, uuid.UUID(int=5): 2},
+                                 b'{"2020-01-02":1,"00000000-0000-0000-0000-000000000005":2}')
+
+    def test_sort_keys(self):
+        categories = {i: 'category {}'.format(i) for i in (10, 2, 1)}
+
+        # keys sort as the text they are written as, whichever backend runs
+        self.assertBackendsAgree({'categories': categories, 'b': [{'z': 1, 'a': 2}], 'a': None},
+                                 b'{"a":null,"b":[{"a":2,"z":1}],'
+                                 b'"categories":{"1":"category 1","10":"category 10","2":"category 2"}}',
+                                 sort_keys=True)
+        self.assertBackendsAgree({1: 'a', 'b': 'b', None: 'c'}, b'{"1":"a","b":"b","null":"c"}', sort_keys=True)
+
+    def test_datetimes(self):
+        offset = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+        self.assertBackendsAgree([
+            datetime.date(2020, 1, 2),
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+            datetime.datetime(2020, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=offset),
+            datetime.time(3, 4, 5, 7),
+        ], b'["2020-01-02","2020-01-02T03:04:05","2020-01-02T03:04:05.000006+00:00",'
+           b'"2020-01-02T03:04:05+05:30","03:04:05.000007"]')
+
+    def test_objects_are_not_formatted(self):
+        for name, dumps in fast_json.BACKENDS.items():
+            with self.subTest(backend=name):
+                with self.assertRaises(TypeError):
+                    dumps({'drink': Model()})
+
+    def test_pretty_print_in_debug(self):
+        app = Flask(__name__)
+        fast_json.init_app(app)
+
+        with app.app_context():
+            self.assertEqual(fast_json.jsonify(a=1).get_data(), b'{"a":1}\n')
+            app.debug = True
+            self.assertEqual(fast_json.jsonify(a=1).get_data(), b'{\n  "a": 1\n}\n')
+            self.assertEqual(flask.jsonify(a=1).get_data(), b'{\n  "a": 1\n}\n')
+            if fast_json.DefaultJSONProvider is not None:
+                app.json.compact = True
+                self.assertEqual(fast_json.jsonify(a=1).get_data(), b'{"a":1}\n')
+                self.assertEqual(flask.jsonify(a=1).get_data(), b'{"a":1}\n')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import json
+import unittest
+
+from src.database.models import Drink
+
+
+class DrinkTestCase(unittest.TestCase):
+    """This class represents the drink serialization test case"""
+
+    def setUp(self):
+        self.drink = Drink(title='water', recipe=json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}]))
+
+    def test_short_and_long(self):
+        self.assertEqual(self.drink.short()['recipe'], [{'color': 'blue', 'parts': 1}])
+        self.assertEqual(self.drink.long()['recipe'], [{'name': 'water', 'color': 'blue', 'parts': 1}])
+
+    def test_reassigning_recipe_invalidates_cache(self):
+        self.drink.long()
+        self.drink.recipe = json.dumps([{'name': 'milk', 'color': 'white', 'parts': 2}])
+
+        self.assertEqual(self.drink.short()['recipe'], [{'color': 'white', 'parts': 2}])
+        self.assertEqual(self.drink.long()['recipe'], [{'name': 'milk', 'color': 'white', 'parts': 2}])
+
+    def test_returns_a_copy_of_the_recipe(self):
+        short_recipe = self.drink.short()['recipe']
+        long_recipe = self.drink.long()['recipe']
+        short_recipe[0]['parts'] = 5
+        long_recipe.append({'name': 'ice', 'color': 'white', 'parts': 1})
+
+        self.assertEqual(self.drink.short()['recipe'], [{'color': 'blue', 'parts': 1}])
+        self.assertEqual(self.drink.long()['recipe'], [{'name': 'water', 'color': 'blue', 'parts': 1}])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from src.auth.token_cache import TokenCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = TokenCache(max_size=2, clock=self.clock)
+
+    def payload(self, sub, lifetime=60):
+        return {'sub': sub, 'exp': self.clock.now + lifetime, 'permissions': ['get:drinks-detail']}
+
+    def test_hit_until_exp(self):
+        self.cache.put('a', self.payload('a', lifetime=60))
+
+        self.clock.now += 59
+        self.assertEqual(self.cache.get('a').payload['sub'], 'a')
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_expired_token_is_not_cached(self):
+        self.cache.put('a', self.payload('a', lifetime=0))
+
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_token_without_exp_is_not_cached(self):
+        for payload in ({'sub': 'a'}, {'sub': 'a', 'exp': 'tomorrow'}):
+            self.cache.put('a', payload)
+
+            self.assertIsNone(self.cache.get('a'))
+            self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_least_recently_used_token_is_evicted(self):
+        self.cache.put('a', self.payload('a'))
+        self.cache.put('b', self.payload('b'))
+        self.cache.get('a')
+        self.cache.put('c', self.payload('c'))
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a').payload['sub'], 'a')
+        self.assertEqual(self.cache.get('c').payload['sub'], 'c')
+        self.assertEqual(self.cache.stats()['size'], 2)
+
+    def test_hit_and_miss_counters(self):
+        self.cache.get('a')
+        self.cache.put('a', self.payload('a'))
+        self.cache.get('a')
+        self.cache.get('a')
+
+        self.assertEqual(self.cache.stats(), {'size': 1, 'max_size': 2, 'hits': 2, 'misses': 1})
+        self.cache.clear()
+        self.assertEqual(self.cache.stats(), {'size': 0, 'max_size': 2, 'hits': 0, 'misses': 0})
+
+    def test_stores_a_copy_of_the_payload(self):
+        payload = self.payload('a')
+        self.cache.put('a', payload)
+        payload['permissions'].append('delete:drinks')
+
+        self.assertEqual(self.cache.get('a').payload['permissions'], ['get:drinks-detail'])
+
+    def test_raw_token_is_not_kept(self):
+        self.cache.put('secret-token', self.payload('a'))
+
+        self.assertNotIn('secret-token', self.cache._entries)
+        self.assertIn(TokenCache.digest('secret-token'), self.cache._entries)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
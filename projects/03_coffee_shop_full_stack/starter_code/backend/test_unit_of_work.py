@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+from flask import Flask, abort, request
+from sqlalchemy import exc
+
+from src.database.models import setup_db, db, Drink
+
+
+def create_app(database_path):
+    app = Flask(__name__)
+    setup_db(app)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///{}".format(database_path)
+
+    # the PATCH /drinks/<id> handling the API is expected to implement
+    @app.route('/drinks/<int:id>', methods=['PATCH'])
+    def patch_drink(id):
+        drink = Drink.query.get(id)
+        if drink is None:
+            abort(404)
+        drink.title = request.get_json()['title']
+        try:
+            drink.update()
+        except exc.IntegrityError:
+            abort(422)
+        return json.dumps({'success': True, 'drinks': [drink.long()]})
+
+    return app
+
+
+class UnitOfWorkTestCase(unittest.TestCase):
+    """This class represents the request-scoped commit test case"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app(os.path.join(self.directory.name, 'test.db'))
+        self.client = self.app.test_client
+        with self.app.app_context():
+            db.create_all()
+            recipe = json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}])
+            Drink(title='water', recipe=recipe).insert()
+            Drink(title='ice', recipe=recipe).insert()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def test_patch_drink(self):
+        res = self.client().patch('/drinks/1', json={'title': 'sparkling water'})
+
+        self.assertEqual(res.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(Drink.query.get(1).title, 'sparkling water')
+
+    def test_422_patch_drink_with_duplicate_title(self):
+        res = self.client().patch('/drinks/1', json={'title': 'ice'})
+
+        self.assertEqual(res.status_code, 422)
+        with self.app.app_context():
+            self.assertEqual(Drink.query.get(1).title, 'water')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,14 @@
 import os
 from flask import Flask
+from flask_cors import CORS
 from models import setup_db
+import instrumentation
 
 def create_app(test_config=None):
 
     app = Flask(__name__)
     setup_db(app)
+    instrumentation.init_app(app)
     CORS(app)
 
     @app.route('/')
@@ -0,0 +1,264 @@
+# Shared helper, copied into every project that uses it so each one stays
+# standalone. Copies differ only in indent width, which follows each project;
+# change them together. test_shared_helpers.py at the repo root checks this.
+'''
+instrumentation.py
+    per-request metrics served in the Prometheus text format at METRICS_URL
+    when it is set: latency by route, the number and duration of SQL queries
+    each request runs (from SQLAlchemy engine events) and template render time
+
+    with PROFILE_SAMPLE_RATE above 0 a sample of requests runs under cProfile
+    and the profiles of the slowest PROFILE_SLOWEST of them are kept in
+    PROFILE_DIR for snakeviz, flameprof or pstats
+'''
+import bisect
+import cProfile
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# used when neither the app config nor the environment sets a value
+DEFAULTS = {
+    'METRICS_URL': '',
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_SLOWEST': 10,
+    'PROFILE_DIR': 'profiles',
+}
+
+
+def setting(app, name):
+    value = app.config.get(name)
+    if value is None:
+        value = os.environ.get(name)
+    return DEFAULTS[name] if value is None else value
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, escape(value)) for name, value in pairs) + '}'
+
+
+'''
+Histogram
+    a Prometheus histogram with one series per combination of label values
+'''
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        with self._lock:
+            series = [(labels, list(counts), total, count)
+                      for labels, (counts, total, count) in sorted(self._series.items())]
+
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        for label_values, counts, total, count in series:
+            pairs = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append('{}_bucket{} {}'.format(self.name, format_labels(pairs + [('le', repr(float(bound)))]), cumulative))
+            lines.append('{}_bucket{} {}'.format(self.name, format_labels(pairs + [('le', '+Inf')]), count))
+            lines.append('{}_sum{} {}'.format(self.name, format_labels(pairs), repr(total)))
+            lines.append('{}_count{} {}'.format(self.name, format_labels(pairs), count))
+        return '\n'.join(lines)
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = Histogram(
+            'http_request_duration_seconds', 'Request latency by route.',
+            ('method', 'route', 'status'), LATENCY_BUCKETS)
+        self.queries = Histogram(
+            'http_request_db_queries', 'SQL queries run per request by route.',
+            ('route',), QUERY_COUNT_BUCKETS)
+        self.query_time = Histogram(
+            'http_request_db_seconds', 'Time spent in SQL per request by route.',
+            ('route',), LATENCY_BUCKETS)
+        self.templates = Histogram(
+            'template_render_seconds', 'Template render time by template.',
+            ('template',), LATENCY_BUCKETS)
+
+    def expose(self):
+        histograms = (self.requests, self.queries, self.query_time, self.templates)
+        return '\n'.join(histogram.expose() for histogram in histograms) + '\n'
+
+
+class RequestStats:
+    __slots__ = ('start', 'status', 'queries', 'query_seconds', 'profile')
+
+    def __init__(self, profile=None):
+        self.start = time.perf_counter()
+        self.status = None
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.profile = profile
+
+
+'''
+Profiler
+    runs a random PROFILE_SAMPLE_RATE share of requests under cProfile and
+    keeps the profiles of the `slowest` slowest of them on disk
+'''
+class Profiler:
+    def __init__(self, directory, slowest, rate):
+        self.directory = directory
+        self.slowest = slowest
+        self.rate = rate
+        self._kept = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # cProfile cannot run in two threads at once on Python 3.12+
+        self._running = threading.Lock()
+
+    def start(self):
+        if random.random() >= self.rate or not self._running.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler, such as a debugger, is already active
+            self._running.release()
+            return None
+        return profile
+
+    def stop(self, profile, seconds, method, route):
+        profile.disable()
+        self._running.release()
+        with self._lock:
+            if len(self._kept) >= self.slowest and seconds <= self._kept[0][0]:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            name = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'index'
+            path = os.path.join(self.directory, '{:010.1f}ms-{}-{}-{}.prof'.format(
+                seconds * 1000, method, name, next(self._ids)))
+            profile.dump_stats(path)
+            heapq.heappush(self._kept, (seconds, path))
+            if len(self._kept) > self.slowest:
+                _, evicted = heapq.heappop(self._kept)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+
+def timed_template_class(base, metrics):
+    class TimedTemplate(base):
+        def render(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().render(*args, **kwargs)
+            finally:
+                metrics.templates.observe(time.perf_counter() - start, self.name or '<string>')
+
+    return TimedTemplate
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('instrumentation_query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['instrumentation_query_start'].pop()
+    if has_request_context():
+        stats = g.get('instrumentation')
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += time.perf_counter() - start
+
+
+def handle_error(context):
+    # a failed query never reaches after_cursor_execute
+    if context.connection is not None:
+        starts = context.connection.info.get('instrumentation_query_start')
+        if starts:
+            starts.pop()
+
+
+def listen_for_queries():
+    # registered on the Engine class once, so engines created later are covered too
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(Engine, 'handle_error', handle_error)
+
+
+'''
+init_app(app)
+    instruments every request of `app`; call it before any template is
+    loaded so render times are recorded for all of them
+'''
+def init_app(app):
+    metrics = Metrics()
+    app.extensions['instrumentation'] = metrics
+    listen_for_queries()
+    app.jinja_env.template_class = timed_template_class(app.jinja_env.template_class, metrics)
+
+    rate = float(setting(app, 'PROFILE_SAMPLE_RATE'))
+    profiler = None
+    if rate > 0:
+        profiler = Profiler(setting(app, 'PROFILE_DIR'), int(setting(app, 'PROFILE_SLOWEST')), rate)
+
+    @app.before_request
+    def start_request():
+        if request.endpoint != 'metrics':
+            g.instrumentation = RequestStats(profiler.start() if profiler else None)
+
+    @app.after_request
+    def record_status(response):
+        stats = g.get('instrumentation')
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request(exception=None):
+        stats = g.pop('instrumentation', None)
+        if stats is None:
+            return
+        seconds = time.perf_counter() - stats.start
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        metrics.requests.observe(seconds, request.method, route, str(stats.status or 500))
+        metrics.queries.observe(stats.queries, route)
+        metrics.query_time.observe(stats.query_seconds, route)
+        if stats.profile is not None:
+            profiler.stop(stats.profile, seconds, request.method, route)
+
+    url = setting(app, 'METRICS_URL')
+    if url:
+        app.add_url_rule(url, 'metrics', lambda: Response(metrics.expose(), mimetype='text/plain; version=0.0.4'))
+
+    return metrics
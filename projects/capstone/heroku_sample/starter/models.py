@@ -1,21 +1,26 @@
-from sqlalchemy import Column, String, create_engine
-from flask_sqlalchemy import SQLAlchemy
+import os
+from sqlalchemy import Column, String, Integer, MetaData, Table, create_engine
 import json
 
+from pool import PooledSQLAlchemy
+from schema import Schema
+
 database_path = os.environ['DATABASE_URL']
 
-db = SQLAlchemy()
+db = PooledSQLAlchemy()
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    pool settings are read from the DATABASE_POOL_* config, see pool.py
+    tables are not created here; run `flask migrate`, see schema.py
 '''
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.app = app
     db.init_app(app)
-    db.create_all()
+    schema.init_app(app)
 
 
 '''
@@ -37,4 +42,25 @@ class Person(db.Model):
     return {
       'id': self.id,
       'name': self.name,
-      'catchphrase': self.catchphrase}
\ No newline at end of file
+      'catchphrase': self.catchphrase}
+
+
+'''
+create_tables(connection)
+    migration 1, the People table as first released. frozen: it does not
+    follow the models, so changing one needs a new migration
+'''
+def create_tables(connection):
+    metadata = MetaData()
+    Table('People', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String),
+          Column('catchphrase', String))
+    metadata.create_all(bind=connection)
+
+'''
+schema
+    the migrations run by `flask migrate`, oldest first
+    append new ones to the end; never change one that has been applied
+'''
+schema = Schema(db, [create_tables])
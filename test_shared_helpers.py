@@ -0,0 +1,95 @@
+import io
+import os
+import tokenize
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# every helper module that is copied into more than one project
+COPIES = {
+    'pool.py': [
+        'projects/01_fyyur/starter_code',
+        'projects/02_trivia_api/starter/backend',
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src/database',
+        'projects/capstone/heroku_sample/starter',
+    ],
+    'instrumentation.py': [
+        'projects/01_fyyur/starter_code',
+        'projects/02_trivia_api/starter/backend',
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src',
+        'projects/capstone/heroku_sample/starter',
+    ],
+    'fast_json.py': [
+        'FlaskRecap',
+        'projects/02_trivia_api/starter/backend',
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src',
+    ],
+    'response_cache.py': [
+        'projects/02_trivia_api/starter/backend',
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src/database',
+    ],
+    'unit_of_work.py': [
+        'projects/02_trivia_api/starter/backend',
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src/database',
+    ],
+    'schema.py': [
+        'projects/02_trivia_api/starter/backend',
+        'projects/capstone/heroku_sample/starter',
+    ],
+}
+
+
+def aligned_lines(source):
+    """Numbers of the lines aligned with an open bracket on the line above"""
+    lines = set()
+    brackets = []  # line of each open bracket, and whether code follows it there
+    row = 0
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type in (tokenize.NL, tokenize.COMMENT):
+            continue
+        if brackets:
+            if token.start[0] > row and brackets[-1][1]:
+                lines.add(token.start[0])
+            if token.start[0] == brackets[-1][0]:
+                brackets[-1][1] = True
+        row = token.end[0]
+        if token.type == tokenize.OP and token.string in '([{':
+            brackets.append([row, False])
+        elif token.type == tokenize.OP and token.string in ')]}':
+            brackets.pop()
+    return lines
+
+
+def normalized(path):
+    """The file with its indentation rewritten to 4 spaces per level"""
+    with open(path) as f:
+        source = f.read()
+    lines = source.split('\n')
+    widths = [len(line) - len(line.lstrip(' ')) for line in lines]
+    scale = 4 // min(width for width in widths if width)
+    aligned = aligned_lines(source)
+    out = []
+    shift = 0
+    for number, (line, width) in enumerate(zip(lines, widths), 1):
+        if number not in aligned:
+            shift = width * (scale - 1)
+        # a line aligned with a bracket moves with the line that opened it
+        out.append(' ' * (width + shift) + line[width:])
+    return '\n'.join(out)
+
+
+class SharedHelpersTestCase(unittest.TestCase):
+    """This class checks that the copies of each shared helper have not drifted apart"""
+
+    def test_copies_match(self):
+        for name, directories in COPIES.items():
+            paths = [os.path.join(ROOT, directory, name) for directory in directories]
+            expected = normalized(paths[0])
+            for path in paths[1:]:
+                with self.subTest(path=os.path.relpath(path, ROOT)):
+                    self.assertEqual(normalized(path), expected)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()